@@ -5,8 +5,9 @@ def create_app(config_filename):
     app = Flask(__name__)
     app.config.from_object(config_filename)
     
-    from models.UserModel import db
+    from models.UserModel import db, init_unit_of_work
     db.init_app(app)
+    init_unit_of_work(app)
     
     from resources.users import user_api_bp
     from resources.sessions import session_api_bp
@@ -30,5 +31,8 @@ def create_app(config_filename):
     app.register_blueprint(document_api_bp, url_prefix='/api')
     app.register_blueprint(accounting_api_bp, url_prefix='/api')
 
+    if app.config['OUTBOX_WORKER']:
+        from outbox import init_outbox_worker
+        init_outbox_worker(app)
 
     return app
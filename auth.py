@@ -1,31 +1,33 @@
 from functools import wraps
 from flask import g, session
 from flask_restful import Resource, abort
-import argon2
 from flask_httpauth import HTTPBasicAuth, HTTPTokenAuth, MultiAuth
 
+import config
 import status
+from cache import TTLCache
 
 
-from models.UserModel import User
+from models.UserModel import User, on_commit
 
 basic_auth = HTTPBasicAuth()
 token_auth = HTTPTokenAuth(scheme='Token')
 
+# user id -> Principal, so token requests skip the user and roles SELECTs
+principal_cache = TTLCache(config.PRINCIPAL_CACHE_SIZE, config.PRINCIPAL_CACHE_TTL)
+# users whose roles changed while claim tokens issued to them may still be alive
+revoked_claims = TTLCache(config.PRINCIPAL_CACHE_SIZE, config.AUTH_CLAIMS_TOKEN_EXPIRATION)
+
 
 # auth = MultiAuth(token_auth, basic_auth)
 
 
 @basic_auth.verify_password
 def verify_user_password(username_or_email, password):
-    try:
-        user = User.query.filter_by(username=username_or_email).first()
-        if not user:
-            user = User.query.filter_by(email=username_or_email.lower()).first()
-            # app.logger.info('%s failed to log in', username_or_email)
-        if not user or not user.verify_password(password):
-            return False
-    except argon2.exceptions.VerifyMismatchError:
+    user = User.find_by_login(username_or_email)
+    # if not user:
+    #     app.logger.info('%s failed to log in', username_or_email)
+    if not user or not user.verify_password(password):
         return False
     # app.logger.info('{} logged in successfully'.format(user.username))
     g.user = user
@@ -57,6 +59,8 @@ def role_authenticated(user_roles, required_roles):
 
 
 def get_current_user_role():
+    if isinstance(g.user, Principal):
+        return list(g.user.roles)
     roles = g.user.roles
     ret_roles = []
     for role in roles:
@@ -64,11 +68,64 @@ def get_current_user_role():
     return ret_roles
 
 
+class Principal():
+    """What token authenticated requests know about the current user."""
+    def __init__(self, id, authorized, roles, role_version):
+        self.id = id
+        self.authorized = authorized
+        self.roles = roles
+        self.role_version = role_version
+
+
+def load_principal(user_id):
+    principal = principal_cache.get(user_id)
+    if principal is None:
+        user = User.query.get(user_id)
+        if user is None:
+            return None
+        principal = Principal(user.id, user.authorized, frozenset(role.role_name for role in user.roles), user.role_version)
+        principal_cache.set(user_id, principal)
+    return principal
+
+
+def load_claims_principal(data):
+    user_id = data['id']
+    principal = principal_cache.get(user_id)
+    if principal is None and revoked_claims.get(user_id):
+        principal = load_principal(user_id)
+    if principal is None:
+        return Principal(user_id, data['authorized'], frozenset(data['roles']), data['rv'])
+    if principal.role_version < data['rv']:
+        # the token is newer than the cached roles, which changed on another worker
+        principal_cache.invalidate(user_id)
+        principal = load_principal(user_id)
+    if principal is None or principal.role_version != data['rv']:
+        return None
+    return principal
+
+
+def drop_principal(user_id):
+    principal_cache.invalidate(user_id)
+    revoked_claims.set(user_id, True)
+
+
+def invalidate_principal(user_id):
+    drop_principal(user_id)
+    # again once committed, a request in between may have cached the old roles
+    on_commit(drop_principal, user_id)
+
+
 @token_auth.verify_token
 def verify_token(token):
-    user = User.verify_auth_token(token)
-    if user is not None and is_accepted_by_admin(user):
-        g.user = user
+    data = User.load_auth_token(token)
+    if data is None:
+        return False
+    if 'rv' in data:
+        principal = load_claims_principal(data)
+    else:
+        principal = load_principal(data['id'])
+    if principal is not None and is_accepted_by_admin(principal):
+        g.user = principal
         return True
     return False
 
@@ -14,4 +14,61 @@ SQLALCHEMY_DATABASE_URI = "mysql+pymysql://{DB_USER}:{DB_PASS}@{DB_ADDR}/{DB_NAM
 SQLALCHEMY_MIGRATE_REPO = os.path.join(basedir, 'db_repository')
 PAGINATION_PAGE_SIZE = 5
 PAGINATION_PAGE_ARGUMENT_NAME = 'page'
-BUNDLE_ERRORS = True
\ No newline at end of file
+PAGINATION_CURSOR_ARGUMENT_NAME = 'cursor'
+PAGINATION_FIELDS_ARGUMENT_NAME = 'fields'
+# how list responses fill 'count': exact, cached, estimated or none, overridable with ?count=
+PAGINATION_COUNT_ARGUMENT_NAME = 'count'
+PAGINATION_COUNT_STRATEGY = 'exact'
+PAGINATION_COUNT_CACHE_SIZE = 1024
+PAGINATION_COUNT_CACHE_TTL = 30
+EXPORT_FORMAT_ARGUMENT_NAME = 'format'
+EXPORT_BATCH_SIZE = 500
+BUNDLE_ERRORS = True
+PRINCIPAL_CACHE_SIZE = 1024
+PRINCIPAL_CACHE_TTL = 60
+AUTH_TOKEN_EXPIRATION = 360000
+# opt-in tokens that carry the role set; keep them short lived so revoked roles expire quickly
+AUTH_TOKEN_CLAIMS = False
+AUTH_CLAIMS_TOKEN_EXPIRATION = 900
+# argon2 hashing runs in a process pool, requests beyond the pending limit or waiting
+# longer than the timeout (seconds) get 429. Keep the pending limit below the server's
+# request threads so a login storm cannot hold all of them.
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 4
+PASSWORD_HASH_TIMEOUT = 2
+# fan out queued notifications into messages outside the request, in a thread the server starts
+# with its first request, or with manage.py outbox_worker when this is False
+OUTBOX_WORKER = True
+OUTBOX_POLL_INTERVAL = 5
+OUTBOX_BATCH_SIZE = 100
+# delivered entries are kept only so broadcast job status stays readable, the newest this many of them
+OUTBOX_KEEP_PROCESSED = 1000
+# open message streams are woken in-process, and re-read the table this often for
+# messages written by other workers
+MESSAGE_STREAM_TAIL_INTERVAL = 15
+MESSAGE_STREAM_BATCH_SIZE = 100
+# bulk user import, rows are validated up front and inserted in chunked transactions
+USER_IMPORT_MAX_ROWS = 10000
+USER_IMPORT_CHUNK_SIZE = 500
+# imports hash passwords in worker processes separate from the login pool
+USER_IMPORT_HASH_WORKERS = 2
+# ?include= embeds whitelisted relationships, at most this many levels deep
+INCLUDE_ARGUMENT_NAME = 'include'
+INCLUDE_MAX_DEPTH = 3
+FRIEND_SUGGESTION_LIMIT = 20
+# model add/update/delete only flush, the request commits once at its end
+UNIT_OF_WORK = True
+# rows per transaction when a parent is deleted with ?purge=async
+PURGE_CHUNK_SIZE = 1000
+# rows generated by manage.py seed, parents per table times --scale, roughly 1M rows at scale 1
+SEED_VOLUMES = {
+    'users': 20000, 'sessions': 2000, 'courses': 100, 'heyats': 500, 'sports': 500,
+    'camps': 100, 'documents': 5000, 'reports': 2000, 'expenses': 5000,
+}
+# children generated per parent row
+SEED_FANOUT = {
+    'messages': 25, 'friends': 5, 'session_members': 10, 'tasks': 2, 'lectures': 5,
+    'lecture_students': 30, 'lecture_sessions': 10, 'exams': 2, 'heyat_members': 30,
+    'sport_members': 10, 'camp_members': 30, 'categories': 20, 'multimedia': 2,
+}
+SEED_BATCH_SIZE = 5000
\ No newline at end of file
@@ -0,0 +1,91 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from threading import BoundedSemaphore, Lock
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError
+from werkzeug.exceptions import TooManyRequests
+
+import config
+
+HASHER = PasswordHasher()
+
+
+class HashPoolBusy(TooManyRequests):
+    description = 'Too many password operations in progress, try again later'
+
+
+# run inside the pool workers, so they have to stay module level functions
+def hash_password(password):
+    return HASHER.hash(password)
+
+
+def verify_password(password_hash, password):
+    """return (verified, needs_rehash) for a stored hash"""
+    try:
+        HASHER.verify(password_hash, password)
+    except (VerificationError, InvalidHash):
+        return False, False
+    return True, HASHER.check_needs_rehash(password_hash)
+
+
+class HashPool():
+    """Runs Argon2 work in worker processes so logins cannot starve request threads.
+
+    At most `max_pending` calls may be queued or running, anything beyond that
+    raises HashPoolBusy (429), and so does a call still unfinished after `timeout`
+    seconds, so waiting request threads are released either way. With `workers`
+    set to 0 hashing runs inline.
+    """
+
+    def __init__(self, workers, max_pending, timeout=None):
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashPoolBusy()
+        if not self.workers:
+            try:
+                return fn(*args)
+            finally:
+                self._slots.release()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        # the slot stays taken until the worker is done, not just until this thread gives up
+        future.add_done_callback(lambda future: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise HashPoolBusy()
+
+    def map(self, fn, items, block=False):
+        """run fn over a batch of items, occupying a single pending slot, waiting for one if block"""
+        items = list(items)
+        if not self._slots.acquire(blocking=block):
+            raise HashPoolBusy()
+        try:
+            if not self.workers:
+                return [fn(item) for item in items]
+            chunksize = max(1, len(items) // (self.workers * 4))
+            return list(self._get_executor().map(fn, items, chunksize=chunksize))
+        finally:
+            self._slots.release()
+
+
+hash_pool = HashPool(config.PASSWORD_HASH_WORKERS, config.PASSWORD_HASH_MAX_PENDING, config.PASSWORD_HASH_TIMEOUT)
+# bulk imports queue hundreds of hashes at once, so they get their own workers and never delay
+# logins, concurrent imports take turns hashing a chunk each
+import_hash_pool = HashPool(config.USER_IMPORT_HASH_WORKERS, 1)
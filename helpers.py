@@ -1,43 +1,458 @@
-from flask import url_for
+import base64
+import binascii
+import csv
+import hashlib
+import io
+import json
+
+from flask import Response, g, stream_with_context, url_for
 from flask import current_app
+from flask_restful import abort
+from marshmallow import fields
+from sqlalchemy import event, inspect, text, tuple_
+from sqlalchemy.orm import Session, load_only, selectinload
+from werkzeug.http import quote_etag
+
+import config
+import status
+from cache import TTLCache
+
+COUNT_STRATEGIES = ('exact', 'cached', 'estimated', 'none')
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+count_cache = TTLCache(config.PAGINATION_COUNT_CACHE_SIZE, config.PAGINATION_COUNT_CACHE_TTL)
+# bumped on every write to a table, so cached counts of older versions are never read again
+table_versions = {}
+
+
+def bump_table_versions(table_names):
+    for name in table_names:
+        table_versions[name] = table_versions.get(name, 0) + 1
+
+
+def execute_insert(session, statement, parameters=None):
+    """run a core INSERT, which skips the flush events below, and count its table as written like a flush would"""
+    result = session.execute(statement, parameters)
+    table_names = [statement.table.name]
+    bump_table_versions(table_names)
+    session.info.setdefault('flushed_tables', set()).update(table_names)
+    return result
+
+
+@event.listens_for(Session, 'after_flush')
+def invalidate_counts_after_flush(session, flush_context):
+    table_names = set()
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table_names.update(table.name for table in inspect(instance).mapper.tables)
+    bump_table_versions(table_names)
+    # counts cached between a flush and its commit still saw the old rows
+    session.info.setdefault('flushed_tables', set()).update(table_names)
+
+
+@event.listens_for(Session, 'after_commit')
+def invalidate_counts_after_commit(session):
+    bump_table_versions(session.info.pop('flushed_tables', ()))
+
+
+@event.listens_for(Session, 'after_rollback')
+def forget_flushed_tables(session):
+    session.info.pop('flushed_tables', None)
+
+
+@event.listens_for(Session, 'after_bulk_update')
+def invalidate_counts_after_bulk_update(update_context):
+    bump_table_versions([update_context.primary_table.name])
+
+
+@event.listens_for(Session, 'after_bulk_delete')
+def invalidate_counts_after_bulk_delete(delete_context):
+    bump_table_versions([delete_context.primary_table.name])
+
+
+def compute_etag(objects, *extra):
+    """weak etag from the loaded column values of rows, computed without serializing them"""
+    digest = hashlib.sha1()
+    for obj in objects:
+        state = inspect(obj)
+        values = [(key, state.dict.get(key)) for key in sorted(state.mapper.column_attrs.keys())]
+        digest.update(repr((type(obj).__name__, values)).encode('utf-8'))
+    digest.update(repr(extra).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def nested_objects(schema, objects, seen=None):
+    """rows dumped through the Nested fields of schema, so etags change when any of them does"""
+    seen = set() if seen is None else seen
+    related = []
+    for name, field in schema.fields.items():
+        if isinstance(field, fields.List):
+            field = field.inner
+        if not isinstance(field, fields.Nested):
+            continue
+        children = []
+        for obj in objects:
+            value = getattr(obj, field.attribute or name, None)
+            for child in (value if isinstance(value, list) else [value]):
+                if inspect(child, raiseerr=False) is not None and id(child) not in seen:
+                    seen.add(id(child))
+                    children.append(child)
+        related.extend(children)
+        related.extend(nested_objects(field.schema, children, seen))
+    return related
+
+
+def conditional_response(request, etag, build_result):
+    """304 when the client already has etag, otherwise build and return the body"""
+    headers = {'ETag': quote_etag(etag, weak=True)}
+    if request.method == 'GET' and request.if_none_match.contains_weak(etag):
+        return '', status.HTTP_304_NOT_MODIFIED, headers
+    return build_result(), status.HTTP_200_OK, headers
+
+
+def conditional_dump(request, obj, schema):
+    return conditional_response(request, compute_etag([obj] + nested_objects(schema, [obj])), lambda: schema.dump(obj))
+
+
+# (schema class, field names) -> schema instance restricted with only=
+projected_schemas = {}
+
+
+def get_projected_schema(schema_class, only):
+    key = (schema_class, only)
+    schema = projected_schemas.get(key)
+    if schema is None:
+        schema = schema_class(only=only)
+        projected_schemas[key] = schema
+    return schema
+
+
+class IncludeTree():
+    """Whitelist of relationship paths a resource embeds on ?include=a,a.b
+
+    IncludeTree(Session, SessionSchema, {'users': SessionUserSchema, 'users.tasks': TaskSchema})
+
+    Every prefix of a path has to be whitelisted as well. Each path becomes a
+    selectinload chain, one query per level whatever the number of rows, and
+    a Nested field in a schema subclass built once per combination.
+    """
+
+    def __init__(self, model, schema_class, paths, max_depth=None):
+        self.model = model
+        self.schema_class = schema_class
+        self.paths = paths
+        self.max_depth = max_depth or config.INCLUDE_MAX_DEPTH
+        self._schemas = {}
+
+    def parse(self, request):
+        requested = request.args.get(current_app.config['INCLUDE_ARGUMENT_NAME'])
+        if not requested:
+            return ()
+        paths = set()
+        for path in requested.split(','):
+            path = path.strip()
+            if not path:
+                continue
+            if path not in self.paths or path.count('.') >= self.max_depth:
+                abort(status.HTTP_400_BAD_REQUEST, message='include choices: {}'.format(
+                    ', '.join(name for name in sorted(self.paths) if name.count('.') < self.max_depth)))
+            parts = path.split('.')
+            paths.update('.'.join(parts[:depth]) for depth in range(1, len(parts) + 1))
+        return tuple(sorted(paths))
+
+    def get_relationship(self, path):
+        """relationship property at the end of path"""
+        model = self.model
+        for name in path.split('.'):
+            relationship = inspect(model).relationships[name]
+            model = relationship.mapper.class_
+        return relationship
+
+    def options(self, paths):
+        options = []
+        for path in paths:
+            # prefixes are loaded by the chains of their longer paths
+            if any(other.startswith(path + '.') for other in paths):
+                continue
+            model = self.model
+            loader = None
+            for name in path.split('.'):
+                attribute = getattr(model, name)
+                loader = selectinload(attribute) if loader is None else loader.selectinload(attribute)
+                model = attribute.property.mapper.class_
+            options.append(loader)
+        return options
+
+    def get_schema(self, paths):
+        schema = self._schemas.get(paths)
+        if schema is None:
+            tree = {}
+            for path in paths:
+                node = tree
+                for name in path.split('.'):
+                    node = node.setdefault(name, {})
+            schema = self._build_schema(self.schema_class, tree, '')()
+            self._schemas[paths] = schema
+        return schema
+
+    def _build_schema(self, schema_class, tree, prefix):
+        if not tree:
+            return schema_class
+        nested_fields = {}
+        for name, children in tree.items():
+            path = prefix + name
+            nested = self._build_schema(self.paths[path], children, path + '.')
+            nested_fields[name] = fields.Nested(nested, many=self.get_relationship(path).uselist, dump_only=True)
+        return type(schema_class.__name__, (schema_class,), nested_fields)
+
+    def dump(self, request, obj, schema, paths):
+        """conditional response for a single row loaded with options(paths)"""
+        if paths:
+            schema = self.get_schema(paths)
+        etag = compute_etag([obj] + nested_objects(schema, [obj]), paths)
+        return conditional_response(request, etag, lambda: schema.dump(obj))
 
 
 class PaginationHelper():
-    def __init__(self, request, query, resource_for_url, key_name, schema):
+    def __init__(self, request, query, resource_for_url, key_name, schema, cursor_columns=None, count_strategy=None,
+                 include=None):
         self.request = request
         self.query = query
         self.resource_for_url = resource_for_url
         self.key_name = key_name
         self.schema = schema
+        # IncludeTree of the relationships clients may embed
+        self.include = include
+        self.include_paths = ()
+        # columns of a unique sort key, defaults to the primary key of the queried model
+        self.cursor_columns = cursor_columns
         self.results_per_page = current_app.config['PAGINATION_PAGE_SIZE']
         self.page_argument_name = current_app.config['PAGINATION_PAGE_ARGUMENT_NAME']
+        self.cursor_argument_name = current_app.config['PAGINATION_CURSOR_ARGUMENT_NAME']
+        self.count_argument_name = current_app.config['PAGINATION_COUNT_ARGUMENT_NAME']
+        self.count_strategy = count_strategy or current_app.config['PAGINATION_COUNT_STRATEGY']
+        self.fields_argument_name = current_app.config['PAGINATION_FIELDS_ARGUMENT_NAME']
+        self.export_format_argument_name = current_app.config['EXPORT_FORMAT_ARGUMENT_NAME']
+        self.export_batch_size = current_app.config['EXPORT_BATCH_SIZE']
+        # rows of the page being returned, filled in by paginate_query
+        self.page_objects = []
+
+    def url_for_page(self, **page_args):
+        args = self.request.args.to_dict()
+        args.pop(self.page_argument_name, None)
+        args.pop(self.cursor_argument_name, None)
+        args.update(page_args)
+        args.update(self.request.view_args or {})
+        return url_for(self.resource_for_url, _external=True, **args)
+
+    def apply_fields(self):
+        """restrict the schema and the loaded columns to ?fields=a,b"""
+        requested = self.request.args.get(self.fields_argument_name)
+        if not requested:
+            return
+        only = tuple(sorted(set(name.strip() for name in requested.split(',') if name.strip())))
+        unknown = set(only) - set(self.schema.fields)
+        if unknown:
+            abort(status.HTTP_400_BAD_REQUEST,
+                  message='fields choices: {}'.format(', '.join(self.schema.fields)))
+        self.schema = get_projected_schema(type(self.schema), only)
+        entity = self.query.column_descriptions[0]['entity']
+        column_attrs = entity.__mapper__.column_attrs
+        # hyperlinks and nested fields read other attributes, so load the full row for them
+        if any(name not in column_attrs for name in only):
+            return
+        attributes = [getattr(entity, name) for name in only]
+        if self.cursor_columns is not None:
+            attributes.extend(self.cursor_columns)
+        self.query = self.query.options(load_only(*attributes))
+
+    def apply_include(self):
+        if self.include is None:
+            return
+        self.include_paths = self.include.parse(self.request)
+        if self.include_paths:
+            self.query = self.query.options(*self.include.options(self.include_paths))
+            self.schema = self.include.get_schema(self.include_paths)
+
+    def get_etag_objects(self, objects):
+        # the schema nests the included relationships as well, once apply_include has run
+        return list(objects) + nested_objects(self.schema, objects)
 
     def paginate_query(self):
+        self.apply_include()
+        self.apply_fields()
+        if g.get('list_export'):
+            return self.export_query()
+        # clients opt in to keyset pagination by sending a cursor, empty for the first page
+        if self.cursor_argument_name in self.request.args:
+            return self.paginate_query_by_cursor()
+        count_strategy = self.request.args.get(self.count_argument_name, self.count_strategy)
+        if count_strategy not in COUNT_STRATEGIES:
+            abort(status.HTTP_400_BAD_REQUEST, message='count choices: {}'.format(', '.join(COUNT_STRATEGIES)))
         # If no page number is specified, we assume the request wants page #1
         page_number = self.request.args.get(self.page_argument_name, 1, type=int)
-        paginated_objects = self.query.paginate(
-            page_number,
-            per_page=self.results_per_page,
-            error_out=False)
-        objects = paginated_objects.items
-        if paginated_objects.has_prev:
-            previous_page_url = url_for(
-                self.resource_for_url,
-                page=page_number-1,
-                _external=True)
+        if count_strategy == 'exact':
+            paginated_objects = self.query.paginate(
+                page_number,
+                per_page=self.results_per_page,
+                error_out=False)
+            objects = paginated_objects.items
+            has_prev = paginated_objects.has_prev
+            has_next = paginated_objects.has_next
+            count = paginated_objects.total
+        else:
+            # one extra row tells whether there is a next page without counting
+            objects = self.query.limit(self.results_per_page + 1).offset(
+                (max(page_number, 1) - 1) * self.results_per_page).all()
+            has_prev = page_number > 1
+            has_next = len(objects) > self.results_per_page
+            objects = objects[:self.results_per_page]
+            count = self.count_query(count_strategy)
+        if has_prev:
+            previous_page_url = self.url_for_page(page=page_number-1)
         else:
             previous_page_url = None
-        if paginated_objects.has_next:
-            next_page_url = url_for(
-                self.resource_for_url,
-                page=page_number+1,
-                _external=True)
+        if has_next:
+            next_page_url = self.url_for_page(page=page_number+1)
         else:
             next_page_url = None
-        dumped_objects = self.schema.dump(objects, many=True)
-        return ({
-            self.key_name: dumped_objects,
+        self.page_objects = objects
+        etag = compute_etag(self.get_etag_objects(objects), sorted(self.schema.only or ()), self.include_paths,
+                            previous_page_url, next_page_url, count)
+        return conditional_response(self.request, etag, lambda: {
+            self.key_name: self.schema.dump(objects, many=True),
             'previous': previous_page_url,
             'next': next_page_url,
-            'count': paginated_objects.total
+            'count': count
         })
+
+    def get_table_names(self):
+        mapper = self.query.column_descriptions[0]['entity'].__mapper__
+        return [table.name for table in mapper.tables]
+
+    def count_query(self, count_strategy):
+        if count_strategy == 'none':
+            return None
+        if count_strategy == 'estimated':
+            count = self.estimate_count()
+            if count is not None:
+                return count
+        return self.cached_count()
+
+    def cached_count(self):
+        table_names = self.get_table_names()
+        compiled = self.query.statement.compile()
+        key = (tuple(table_versions.get(name, 0) for name in table_names),
+               str(compiled), repr(sorted(compiled.params.items())))
+        count = count_cache.get(key)
+        if count is None:
+            count = self.query.order_by(None).count()
+            count_cache.set(key, count)
+        return count
+
+    def estimate_count(self):
+        """row count from table statistics, only possible for unfiltered queries on MySQL"""
+        if self.query.whereclause is not None:
+            return None
+        session = self.query.session
+        if session.get_bind().dialect.name != 'mysql':
+            return None
+        return session.execute(
+            text('SELECT TABLE_ROWS FROM information_schema.TABLES '
+                 'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table_name'),
+            {'table_name': self.get_table_names()[0]}).scalar()
+
+    def get_cursor_columns(self):
+        """return the sort key as (column, attribute name) pairs"""
+        if self.cursor_columns is not None:
+            return [(column, column.key) for column in self.cursor_columns]
+        mapper = self.query.column_descriptions[0]['entity'].__mapper__
+        return [(column, mapper.get_property_by_column(column).key) for column in mapper.primary_key]
+
+    @staticmethod
+    def encode_cursor(values):
+        data = json.dumps(values, default=str).encode('utf-8')
+        return base64.urlsafe_b64encode(data).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            return json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+        except (ValueError, binascii.Error):
+            abort(status.HTTP_400_BAD_REQUEST, message='invalid cursor')
+
+    def paginate_query_by_cursor(self):
+        cursor_columns = self.get_cursor_columns()
+        columns = [column for column, key in cursor_columns]
+        query = self.query.order_by(None).order_by(*columns)
+        cursor = self.request.args.get(self.cursor_argument_name)
+        if cursor:
+            last_key = self.decode_cursor(cursor)
+            if not isinstance(last_key, list) or len(last_key) != len(columns):
+                abort(status.HTTP_400_BAD_REQUEST, message='invalid cursor')
+            if len(columns) == 1:
+                query = query.filter(columns[0] > last_key[0])
+            else:
+                query = query.filter(tuple_(*columns) > tuple_(*last_key))
+        # one extra row tells whether there is a next page without counting
+        objects = query.limit(self.results_per_page + 1).all()
+        next_page_url = None
+        if len(objects) > self.results_per_page:
+            objects = objects[:self.results_per_page]
+            last = objects[-1]
+            last_key = [getattr(last, key) for column, key in cursor_columns]
+            next_page_url = self.url_for_page(**{self.cursor_argument_name: self.encode_cursor(last_key)})
+        self.page_objects = objects
+        etag = compute_etag(self.get_etag_objects(objects), sorted(self.schema.only or ()), self.include_paths,
+                            next_page_url)
+        return conditional_response(self.request, etag, lambda: {
+            self.key_name: self.schema.dump(objects, many=True),
+            'next': next_page_url
+        })
+
+    def export_query(self):
+        """stream every row of the query instead of one page"""
+        export_format = self.request.args.get(self.export_format_argument_name, 'ndjson')
+        if export_format not in EXPORT_FORMATS:
+            abort(status.HTTP_400_BAD_REQUEST,
+                  message='format choices: {}'.format(', '.join(EXPORT_FORMATS)))
+        # yield_per streams from a server side cursor, so memory does not grow with the row count
+        rows = (self.schema.dump(item) for item in self.query.yield_per(self.export_batch_size))
+        if export_format == 'csv':
+            lines = self.generate_csv(rows)
+        else:
+            lines = (json.dumps(row, default=str) + '\n' for row in rows)
+        response = Response(stream_with_context(lines), mimetype=EXPORT_FORMATS[export_format])
+        response.headers['Content-Disposition'] = 'attachment; filename={}.{}'.format(
+            self.resource_for_url.split('.')[-1], export_format)
+        return response
+
+    @staticmethod
+    def generate_csv(rows):
+        buffer = io.StringIO()
+        writer = None
+        for row in rows:
+            if writer is None:
+                writer = csv.DictWriter(buffer, fieldnames=list(row), extrasaction='ignore')
+                writer.writeheader()
+            writer.writerow({key: json.dumps(value, default=str) if isinstance(value, (dict, list)) else value
+                             for key, value in row.items()})
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+
+def add_export_resource(api, resource_class, url):
+    """register url/export, streaming everything resource_class.get would paginate
+
+    the export resource keeps the list resource's auth decorators but only answers GET
+    """
+    def get(self, *args, **kwargs):
+        g.list_export = True
+        return resource_class.get(self, *args, **kwargs)
+
+    name = resource_class.__name__.replace('Resource', 'ExportResource')
+    export_class = type(name, (resource_class.__bases__[0],), {
+        'method_decorators': resource_class.method_decorators,
+        'get': get,
+    })
+    api.add_resource(export_class, url + '/export')
@@ -0,0 +1,92 @@
+from flask import has_request_context, request, url_for
+from marshmallow import fields, missing
+from marshmallow.utils import get_value
+from werkzeug.urls import url_quote
+
+# url_for is called once per (endpoint, parameters) with these stand-ins, which are then
+# replaced by format fields, so serializing a row only has to fill in a string
+_SENTINEL_BASE = 918273645500
+
+URL_TEMPLATES_MAX_SIZE = 4096
+
+url_templates = {}
+
+
+def get_url_template(endpoint, fixed_values, names):
+    # relative urls only depend on the mount point, external ones on the Host header as
+    # well, so the cache is cleared rather than grown once clients have sent enough hosts
+    root = None
+    if has_request_context():
+        root = request.url_root if fixed_values.get('_external') else request.script_root
+    key = (root, endpoint, tuple(sorted(fixed_values.items())), names)
+    template = url_templates.get(key)
+    if template is None:
+        if len(url_templates) >= URL_TEMPLATES_MAX_SIZE:
+            url_templates.clear()
+        sentinels = {name: _SENTINEL_BASE + index for index, name in enumerate(names)}
+        url = url_for(endpoint, **fixed_values, **sentinels)
+        template = url.replace('{', '{{').replace('}', '}}')
+        for name, sentinel in sentinels.items():
+            template = template.replace(str(sentinel), '{%s}' % name)
+        url_templates[key] = template
+    return template
+
+
+class URLFor(fields.Field):
+    """Drop-in replacement for ma.URLFor that resolves each endpoint's rule only once.
+
+    ma.URLFor('user_api.adminuserresource', user_id='<id>')
+    """
+    _CHECK_ATTRIBUTE = False
+
+    def __init__(self, endpoint, values=None, **kwargs):
+        self.endpoint = endpoint
+        self.values = dict(values or kwargs)
+        self.fixed_values = {}
+        self.attributes = {}
+        for name, value in self.values.items():
+            if isinstance(value, str) and value.startswith('<') and value.endswith('>'):
+                self.attributes[name] = value[1:-1]
+            else:
+                self.fixed_values[name] = value
+        self.names = tuple(sorted(self.attributes))
+        super().__init__(dump_only=True)
+
+    def _serialize(self, value, key, obj, **kwargs):
+        params = {}
+        for name, attribute in self.attributes.items():
+            attribute_value = get_value(obj, attribute, default=missing)
+            if attribute_value is None:
+                return None
+            if attribute_value is missing:
+                raise AttributeError('{!r} is not a valid attribute of {!r}'.format(attribute, obj))
+            params[name] = url_quote(attribute_value, safe='/:')
+        template = get_url_template(self.endpoint, self.fixed_values, self.names)
+        return template.format(**params)
+
+
+
+def serialize_links(value, key, obj):
+    if isinstance(value, fields.Field):
+        return value.serialize(key, obj)
+    if isinstance(value, dict):
+        return {name: serialize_links(item, name, obj) for name, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [serialize_links(item, key, obj) for item in value]
+    return value
+
+
+class Hyperlinks(fields.Field):
+    """Drop-in replacement for ma.Hyperlinks, serializes the URLFor fields of a (nested) dict or list.
+
+    Hyperlinks({'self': URLFor('user_api.adminuserresource', user_id='<id>')})
+    """
+    _CHECK_ATTRIBUTE = False
+
+    def __init__(self, schema, **kwargs):
+        self.schema = schema
+        kwargs['dump_only'] = True
+        super().__init__(**kwargs)
+
+    def _serialize(self, value, key, obj, **kwargs):
+        return serialize_links(self.schema, key, obj)
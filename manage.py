@@ -1,7 +1,26 @@
+import base64
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
 from flask_script import Manager
-from flask_migrate import Migrate, MigrateCommand
+from flask_migrate import Migrate, MigrateCommand, stamp
+from flask import request
 from run import app
-from models.UserModel import db
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from helpers import PaginationHelper
+from models.UserModel import Message, db, ma
+import auth
+import links
+import outbox
+import query_plans
+import seed as seed_data
+from resources.users import message_schema
 
 
 migrate = Migrate(app, db, compare_type=True)
@@ -9,5 +28,249 @@ manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
 
+@manager.command
+def create_db():
+    """create every table on an empty database and mark it as migrated to the latest revision"""
+    db.create_all()
+    stamp()
+
+
+@manager.command
+def process_outbox():
+    """deliver every pending outbox entry, for deployments running OUTBOX_WORKER = False"""
+    handled = 0
+    batch = outbox.process_outbox(app.config['OUTBOX_BATCH_SIZE'])
+    while batch:
+        handled += batch
+        batch = outbox.process_outbox(app.config['OUTBOX_BATCH_SIZE'])
+    pruned = outbox.prune_outbox(app.config['OUTBOX_KEEP_PROCESSED'])
+    print('{} outbox entries delivered, {} delivered entries pruned'.format(handled, pruned))
+
+
+@manager.command
+def outbox_worker():
+    """deliver outbox entries as they are queued until interrupted, for deployments running OUTBOX_WORKER = False"""
+    outbox.run_outbox_worker(app)
+
+
+def time_scenario(scenario, repeat):
+    """seconds per call of scenario, after one warm up call"""
+    scenario()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        scenario()
+    return (time.perf_counter() - started) / repeat
+
+
+def get_token(client, username, password, claims=False):
+    credentials = base64.b64encode('{}:{}'.format(username, password).encode()).decode()
+    response = client.get('/api/gettoken', query_string={'claims': 'true' if claims else 'false'},
+                          headers={'Authorization': 'Basic ' + credentials})
+    return response.get_json()['token']
+
+
+@manager.command
+def benchmark_auth_tokens(username, password, path='/api/users/self', repeat=500):
+    """requests/sec on path with id-only tokens, cold and cached, and with claim tokens"""
+    repeat = int(repeat)
+    client = app.test_client()
+    plain = {'Authorization': 'Token ' + get_token(client, username, password)}
+    claims = {'Authorization': 'Token ' + get_token(client, username, password, claims=True)}
+
+    def cold():
+        # what every request cost before principals were cached: the user and roles SELECTs
+        auth.principal_cache.clear()
+        client.get(path, headers=plain)
+
+    scenarios = [
+        ('id token, no principal cache', cold),
+        ('id token, cached principal', lambda: client.get(path, headers=plain)),
+        ('claims token', lambda: client.get(path, headers=claims)),
+    ]
+    print('{:<34}{:>14}{:>14}'.format('token', 'requests/s', 'ms'))
+    for name, scenario in scenarios:
+        seconds = time_scenario(scenario, repeat)
+        print('{:<34}{:>14.1f}{:>14.2f}'.format(name, 1 / seconds, seconds * 1000))
+
+
+def latencies(scenario, repeat):
+    """sorted milliseconds of repeat calls of scenario"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        scenario()
+        timings.append((time.perf_counter() - started) * 1000)
+    return sorted(timings)
+
+
+@manager.command
+def benchmark_login_storm(username, password, path='/api/users/self', threads=32, repeat=200):
+    """token authenticated latency on path alone and while threads keep logging in through /api/gettoken"""
+    threads, repeat = int(threads), int(repeat)
+    client = app.test_client()
+    headers = {'Authorization': 'Token ' + get_token(client, username, password)}
+    credentials = base64.b64encode('{}:{}'.format(username, password).encode()).decode()
+    stop = threading.Event()
+    statuses = []
+
+    def log_in():
+        login_client = app.test_client()
+        while not stop.is_set():
+            response = login_client.get('/api/gettoken', headers={'Authorization': 'Basic ' + credentials})
+            statuses.append(response.status_code)
+
+    scenario = lambda: client.get(path, headers=headers)
+    results = [('idle', latencies(scenario, repeat))]
+    workers = [threading.Thread(target=log_in, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    results.append(('{} threads logging in'.format(threads), latencies(scenario, repeat)))
+    stop.set()
+    for worker in workers:
+        worker.join()
+    print('{:<28}{:>10}{:>10}{:>10}'.format(path, 'p50 ms', 'p95 ms', 'max ms'))
+    for name, timings in results:
+        print('{:<28}{:>10.1f}{:>10.1f}{:>10.1f}'.format(
+            name, timings[len(timings) // 2], timings[int(len(timings) * 0.95)], timings[-1]))
+    print('logins by status: {}'.format(dict(Counter(statuses))))
+
+
+@manager.command
+def benchmark_pagination(page=10000, repeat=20):
+    """ms per message list page 1 and page, by OFFSET and by cursor, run it after manage.py seed --scale 2 (1M messages)"""
+    page, repeat = max(int(page), 2), int(repeat)
+    page_size = app.config['PAGINATION_PAGE_SIZE']
+    # the cursor a client would hold after reading every page before this one
+    last_id = db.session.query(Message.id).order_by(Message.id).offset((page - 1) * page_size - 1).limit(1).scalar()
+    if last_id is None:
+        print('the message table has fewer than {} rows'.format((page - 1) * page_size))
+        return
+    cursor = PaginationHelper.encode_cursor([last_id])
+    modes = [
+        ('offset', {'count': 'none'}, {'count': 'none', 'page': page}),
+        ('cursor', {'cursor': ''}, {'cursor': cursor}),
+    ]
+
+    def list_page(query_string):
+        with app.test_request_context('/api/users/self/messages', query_string=query_string):
+            PaginationHelper(request, query=Message.query.order_by(Message.id),
+                             resource_for_url='user_api.messagelistresource', key_name='results',
+                             schema=message_schema).paginate_query()
+            db.session.rollback()
+
+    print('{} messages, {} per page'.format(db.session.query(db.func.count(Message.id)).scalar(), page_size))
+    print('{:<10}{:>14}{:>14}'.format('mode', 'page 1 ms', 'page {} ms'.format(page)))
+    for name, first, deep in modes:
+        first_ms = time_scenario(lambda: list_page(first), repeat) * 1000
+        deep_ms = time_scenario(lambda: list_page(deep), repeat) * 1000
+        print('{:<10}{:>14.2f}{:>14.2f}'.format(name, first_ms, deep_ms))
+
+
+@manager.command
+def benchmark_links(count=10000, repeat=5):
+    """ms to dump the AdminUserSchema links of count objects with ma.URLFor and with links.URLFor"""
+    count, repeat = int(count), int(repeat)
+    endpoints = {'self': 'user_api.adminuserresource', 'roles': 'user_api.adminrolelistresource',
+                 'messages': 'user_api.adminmessagelistresource'}
+
+    class StockLinksSchema(ma.Schema):
+        _links = ma.Hyperlinks({name: ma.URLFor(endpoint, user_id='<id>') for name, endpoint in endpoints.items()})
+
+    class CachedLinksSchema(ma.Schema):
+        _links = links.Hyperlinks({name: links.URLFor(endpoint, user_id='<id>') for name, endpoint in endpoints.items()})
+
+    objects = [SimpleNamespace(id=number) for number in range(1, count + 1)]
+    with app.test_request_context('/api/users'):
+        stock = StockLinksSchema(many=True)
+        cached = CachedLinksSchema(many=True)
+        assert stock.dump(objects[:10]) == cached.dump(objects[:10])
+        print('{:<16}{:>14}'.format('{} objects'.format(count), 'ms'))
+        for name, schema in [('ma.URLFor', stock), ('links.URLFor', cached)]:
+            print('{:<16}{:>14.1f}'.format(name, time_scenario(lambda: schema.dump(objects), repeat) * 1000))
+
+
+def benchmark_scenarios(client, headers):
+    """(name, callable issuing the request) pairs exercised by benchmark_unit_of_work"""
+    def create_user():
+        name = 'bench' + uuid.uuid4().hex[:12]
+        client.post('/api/users', json={'username': name, 'password': name, 'type': 'student',
+                                        'email': name + '@example.com'})
+
+    def add_and_delete_dial():
+        response = client.post('/api/users/self/dials', headers=headers, json={'number': '09120000000', 'type': 'mobile'})
+        url = response.get_json().get('url')
+        if url:
+            client.delete(url, headers=headers)
+
+    return [
+        ('POST /users', create_user),
+        ('PATCH /users/self', lambda: client.patch('/api/users/self', headers=headers, json={})),
+        ('POST+DELETE /users/self/dials', add_and_delete_dial),
+        ('POST /users/self/messages/read', lambda: client.post('/api/users/self/messages/read', headers=headers,
+                                                               json={'before': 1})),
+    ]
+
+
+@manager.command
+def benchmark_unit_of_work(username, password, repeat=20):
+    """commits and latency per request with UNIT_OF_WORK off and on, run it against a benchmark database"""
+    repeat = int(repeat)
+    main_thread = threading.current_thread()
+    commits = [0]
+
+    def count_commit(session):
+        # the outbox worker commits on its own thread
+        if threading.current_thread() is main_thread:
+            commits[0] += 1
+
+    event.listen(Session, 'after_commit', count_commit)
+    client = app.test_client()
+    headers = {'Authorization': 'Token ' + get_token(client, username, password)}
+    results = {}
+    for unit_of_work in (False, True):
+        app.config['UNIT_OF_WORK'] = unit_of_work
+        for name, scenario in benchmark_scenarios(client, headers):
+            commits[0] = 0
+            started = time.perf_counter()
+            for _ in range(repeat):
+                scenario()
+            elapsed = time.perf_counter() - started
+            results.setdefault(name, []).append((commits[0] / repeat, elapsed * 1000 / repeat))
+    event.remove(Session, 'after_commit', count_commit)
+    print('{:<34}{:>16}{:>16}{:>14}{:>14}'.format('endpoint', 'commits before', 'commits after', 'ms before', 'ms after'))
+    for name, ((commits_before, ms_before), (commits_after, ms_after)) in results.items():
+        print('{:<34}{:>16.1f}{:>16.1f}{:>14.1f}{:>14.1f}'.format(name, commits_before, commits_after, ms_before, ms_after))
+
+
+
+@manager.command
+def check_query_plans(username, password):
+    """EXPLAIN the filtered SELECTs every GET resource runs as username and fail on full scans, run it against a seeded database"""
+    client = app.test_client()
+    headers = {'Authorization': 'Token ' + get_token(client, username, password)}
+    failures = query_plans.check_query_plans(app, client, headers)
+    for url, statement, rows in failures:
+        print('full scan: {}'.format(url))
+        print('    {}'.format(' '.join(statement.split())))
+        for row in rows:
+            print('    {}'.format(row))
+    print('{} filtered statements scan a table'.format(len(failures)))
+    if failures:
+        sys.exit(1)
+
+
+@manager.command
+def seed(scale=1.0, random_seed=0):
+    """bulk insert SEED_VOLUMES times scale synthetic rows, for benchmarks against SQLite or a local MySQL"""
+    scale = float(scale)
+    volumes = {table: int(count * scale) for table, count in app.config['SEED_VOLUMES'].items()}
+    started = time.perf_counter()
+    counts = seed_data.seed(volumes, app.config['SEED_FANOUT'], app.config['SEED_BATCH_SIZE'], int(random_seed))
+    elapsed = time.perf_counter() - started
+    for table, count in counts.items():
+        print('{:<24}{:>10}'.format(table, count))
+    print('{} rows in {:.1f}s'.format(sum(counts.values()), elapsed))
+
+
 if __name__ == '__main__':
     manager.run()
@@ -0,0 +1,35 @@
+"""count role changes of each user so cached principals and tokens can tell they are stale
+
+Revision ID: 07de413911e5
+Revises: 8c41e07b2d95
+Create Date: 2026-10-18 16:40:09.000000
+
+Databases created with manage.py create_db after the model declared the
+column already have it, so it is skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '07de413911e5'
+down_revision = '8c41e07b2d95'
+branch_labels = None
+depends_on = None
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    if 'role_version' not in existing_columns('user'):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.add_column(sa.Column('role_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    if 'role_version' in existing_columns('user'):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.drop_column('role_version')
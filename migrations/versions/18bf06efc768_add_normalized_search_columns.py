@@ -0,0 +1,107 @@
+"""add the normalized copies of searched text columns and fill them
+
+Revision ID: 18bf06efc768
+Revises: 52fdea081adf
+Create Date: 2026-10-18 17:58:14.000000
+
+Rows are normalized in python with normalization.normalize_text, the function
+the models keep the columns in sync with, since its character folding has no
+portable SQL form. The user details indexes move from the raw columns to the
+normalized ones. Databases created with manage.py create_db after the models
+declared these columns already have them, so existing ones are skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from normalization import normalize_text
+
+
+# revision identifiers, used by Alembic.
+revision = '18bf06efc768'
+down_revision = '52fdea081adf'
+branch_labels = None
+depends_on = None
+
+# table -> (primary key, {source column: (normalized column, length)})
+NORMALIZED_COLUMNS = {
+    'user_details': ('user_id', {'firstname': ('firstname_normalized', 50), 'lastname': ('lastname_normalized', 50),
+                                 'nat_id': ('nat_id_normalized', 10)}),
+    'document': ('id', {'topic': ('topic_normalized', 50)}),
+    'course': ('id', {'name': ('name_normalized', 50)}),
+    'heyat': ('id', {'reason': ('reason_normalized', 50)}),
+}
+# index name -> (table, columns), the names create_all gives them
+INDEXES = {
+    'ix_user_details_nat_id_normalized': ('user_details', ['nat_id_normalized']),
+    'ix_document_topic_normalized': ('document', ['topic_normalized']),
+    'ix_course_name_normalized': ('course', ['name_normalized']),
+    'ix_heyat_reason_normalized': ('heyat', ['reason_normalized']),
+}
+BATCH_SIZE = 1000
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def existing_indexes(table):
+    return {index['name']: index['column_names'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def backfill(table, key, columns):
+    """normalize every row of table, BATCH_SIZE rows per UPDATE round trip in primary key order"""
+    bind = op.get_bind()
+    rows = sa.table(table, sa.column(key), *[sa.column(name) for pair in columns.items() for name in pair])
+    update = rows.update().where(rows.c[key] == sa.bindparam('_key')).values(
+        {shadow: sa.bindparam(shadow) for shadow in columns.values()})
+    last = None
+    while True:
+        select = sa.select([rows.c[key]] + [rows.c[source] for source in columns]).order_by(
+            rows.c[key]).limit(BATCH_SIZE)
+        if last is not None:
+            select = select.where(rows.c[key] > last)
+        batch = bind.execute(select).fetchall()
+        if not batch:
+            return
+        bind.execute(update, [dict({shadow: normalize_text(row[source]) for source, shadow in columns.items()},
+                                   _key=row[key]) for row in batch])
+        last = batch[-1][key]
+
+
+def upgrade():
+    for table, (key, columns) in NORMALIZED_COLUMNS.items():
+        missing = [(shadow, length) for shadow, length in columns.values() if shadow not in existing_columns(table)]
+        if missing:
+            with op.batch_alter_table(table) as batch_op:
+                for shadow, length in missing:
+                    batch_op.add_column(sa.Column(shadow, sa.String(length=length), nullable=True))
+        backfill(table, key, {source: shadow for source, (shadow, length) in columns.items()})
+    for name, (table, columns) in INDEXES.items():
+        if name not in existing_indexes(table):
+            op.create_index(name, table, columns)
+    if 'ix_user_details_nat_id' in existing_indexes('user_details'):
+        op.drop_index('ix_user_details_nat_id', table_name='user_details')
+    if existing_indexes('user_details').get('ix_user_details_name') != ['firstname_normalized', 'lastname_normalized']:
+        if 'ix_user_details_name' in existing_indexes('user_details'):
+            op.drop_index('ix_user_details_name', table_name='user_details')
+        op.create_index('ix_user_details_name', 'user_details', ['firstname_normalized', 'lastname_normalized'],
+                        mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade():
+    if 'ix_user_details_name' in existing_indexes('user_details'):
+        op.drop_index('ix_user_details_name', table_name='user_details')
+    op.create_index('ix_user_details_name', 'user_details', ['firstname', 'lastname'],
+                    mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    if 'ix_user_details_nat_id' not in existing_indexes('user_details'):
+        op.create_index('ix_user_details_nat_id', 'user_details', ['nat_id'])
+    for name, (table, columns) in INDEXES.items():
+        if name in existing_indexes(table):
+            op.drop_index(name, table_name=table)
+    for table, (key, columns) in NORMALIZED_COLUMNS.items():
+        present = [shadow for shadow, length in columns.values() if shadow in existing_columns(table)]
+        if present:
+            with op.batch_alter_table(table) as batch_op:
+                for shadow in present:
+                    batch_op.drop_column(shadow)
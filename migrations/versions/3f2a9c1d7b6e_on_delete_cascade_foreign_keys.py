@@ -0,0 +1,91 @@
+"""delete children with ON DELETE CASCADE foreign keys
+
+Revision ID: 3f2a9c1d7b6e
+Revises:
+Create Date: 2026-10-18 14:32:17.000000
+
+Databases created before migrations were kept in the tree start here. New
+databases are created from the models with manage.py create_db instead.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c1d7b6e'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# reflected SQLite foreign keys have no name, batch mode names them by this convention
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+# table -> (columns, referred table, referred columns) of the keys deleting with their parent
+CASCADES = {
+    'user_details': [(['user_id'], 'user', ['id'])],
+    'student_details': [(['id'], 'user_details', ['user_id'])],
+    'officer_details': [(['id'], 'user_details', ['user_id'])],
+    'user_roles': [(['user_id'], 'user', ['id'])],
+    'dial': [(['user_id'], 'user', ['id'])],
+    'grade': [(['user_id'], 'user', ['id'])],
+    'message': [(['user_id'], 'user', ['id'])],
+    'notification': [(['message_id'], 'message', ['id'])],
+    'friend': [(['user_id'], 'user', ['id']), (['friend_id'], 'user', ['id'])],
+    'session_details': [(['session_id'], 'session', ['id'])],
+    'session_user': [(['session_id'], 'session', ['id'])],
+    'task': [(['user_id', 'session_id'], 'session_user', ['user_id', 'session_id'])],
+    'deadline': [(['task_id'], 'task', ['id'])],
+    'lecture_user': [(['lecture_id'], 'lecture', ['id'])],
+    'lecture_session': [(['lecture_id'], 'lecture', ['id'])],
+    'lecture_user_session': [(['session_id'], 'lecture_session', ['id'])],
+    'exam': [(['lecture_id'], 'lecture', ['id'])],
+    'exam_result': [(['exam_id'], 'exam', ['id'])],
+    'heyat_users': [(['heyat_id'], 'heyat', ['id'])],
+    'user_payments': [(['camp_id'], 'camp', ['id'])],
+}
+# lecture_user.student_id is not unique, so it cannot be referenced, the student is
+STUDENT_KEYS = {
+    'lecture_user_session': (['student_id'], 'user', ['id']),
+    'exam_result': (['student_id'], 'user', ['id']),
+}
+OLD_STUDENT_KEYS = {
+    'lecture_user_session': (['student_id'], 'lecture_user', ['student_id']),
+    'exam_result': (['student_id'], 'lecture_user', ['student_id']),
+}
+
+
+def replace_foreign_keys(table, keys):
+    """drop every foreign key on the columns of keys, then create keys as (columns, referred, referred columns, ondelete)"""
+    columns = {column for key_columns, _, _, _ in keys for column in key_columns}
+    existing = sa.inspect(op.get_bind()).get_foreign_keys(table)
+    names = set()
+    for foreign_key in existing:
+        if columns & set(foreign_key['constrained_columns']):
+            # unnamed keys sharing a first column get one conventional name, which drops them all
+            names.add(foreign_key['name'] or NAMING_CONVENTION['fk'] % {
+                'table_name': table, 'column_0_name': foreign_key['constrained_columns'][0],
+                'referred_table_name': foreign_key['referred_table']})
+    with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+        for name in sorted(names):
+            batch_op.drop_constraint(name, type_='foreignkey')
+        for key_columns, referred_table, referred_columns, ondelete in keys:
+            name = NAMING_CONVENTION['fk'] % {
+                'table_name': table, 'column_0_name': key_columns[0], 'referred_table_name': referred_table}
+            batch_op.create_foreign_key(name, referred_table, key_columns, referred_columns, ondelete=ondelete)
+
+
+def upgrade():
+    for table, keys in CASCADES.items():
+        keys = [key + ('CASCADE',) for key in keys]
+        if table in STUDENT_KEYS:
+            keys.append(STUDENT_KEYS[table] + (None,))
+        replace_foreign_keys(table, keys)
+
+
+def downgrade():
+    for table, keys in CASCADES.items():
+        keys = [key + (None,) for key in keys]
+        if table in OLD_STUDENT_KEYS:
+            keys.append(OLD_STUDENT_KEYS[table] + (None,))
+        replace_foreign_keys(table, keys)
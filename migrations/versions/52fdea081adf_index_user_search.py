@@ -0,0 +1,39 @@
+"""index the user details columns user search matches on
+
+Revision ID: 52fdea081adf
+Revises: 9e7da7bbc65f
+Create Date: 2026-10-18 17:34:52.000000
+
+On MySQL the name index is FULLTEXT with the ngram parser, which MATCH ...
+AGAINST needs to find Persian names by any part of them. Elsewhere it is a
+plain index. Databases created with manage.py create_db after the model
+declared these indexes already have them, so existing ones are skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '52fdea081adf'
+down_revision = '9e7da7bbc65f'
+branch_labels = None
+depends_on = None
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'ix_user_details_nat_id' not in existing_indexes('user_details'):
+        op.create_index('ix_user_details_nat_id', 'user_details', ['nat_id'])
+    if 'ix_user_details_name' not in existing_indexes('user_details'):
+        op.create_index('ix_user_details_name', 'user_details', ['firstname', 'lastname'],
+                        mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
+
+def downgrade():
+    for name in ('ix_user_details_name', 'ix_user_details_nat_id'):
+        if name in existing_indexes('user_details'):
+            op.drop_index(name, table_name='user_details')
@@ -0,0 +1,59 @@
+"""index the columns list and detail resources filter on
+
+Revision ID: 8c41e07b2d95
+Revises: 3f2a9c1d7b6e
+Create Date: 2026-10-18 16:05:42.000000
+
+Databases created with manage.py create_db after the models declared these
+indexes already have them, so existing ones are skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e07b2d95'
+down_revision = '3f2a9c1d7b6e'
+branch_labels = None
+depends_on = None
+
+# index name -> (table, columns), the names create_all gives them
+INDEXES = {
+    'ix_user_type': ('user', ['type']),
+    'ix_user_roles_role_name_user_id': ('user_roles', ['role_name', 'user_id']),
+    'ix_dial_user_id': ('dial', ['user_id']),
+    'ix_grade_user_id': ('grade', ['user_id']),
+    'ix_message_user_id_read': ('message', ['user_id', 'read']),
+    'ix_user_payments_user_id': ('user_payments', ['user_id']),
+    'ix_user_payments_camp_id_user_id': ('user_payments', ['camp_id', 'user_id']),
+    'ix_document_category_id': ('document', ['category_id']),
+    'ix_lecture_course_id': ('lecture', ['course_id']),
+    'ix_lecture_user_lecture_id_student_id': ('lecture_user', ['lecture_id', 'student_id']),
+    'ix_lecture_session_lecture_id': ('lecture_session', ['lecture_id']),
+    'ix_lecture_user_session_session_id_student_id': ('lecture_user_session', ['session_id', 'student_id']),
+    'ix_exam_lecture_id': ('exam', ['lecture_id']),
+    'ix_exam_result_exam_id_student_id': ('exam_result', ['exam_id', 'student_id']),
+    'ix_heyat_users_heyat_id_user_id': ('heyat_users', ['heyat_id', 'user_id']),
+    'ix_sport_users_sport_id_user_id': ('sport_users', ['sport_id', 'user_id']),
+    'ix_session_user_session_id_user_id': ('session_user', ['session_id', 'user_id']),
+    'ix_task_user_id_session_id': ('task', ['user_id', 'session_id']),
+    'ix_deadline_task_id': ('deadline', ['task_id']),
+    'ix_multimedia_report_id': ('multimedia', ['report_id']),
+}
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, (table, columns) in INDEXES.items():
+        if name not in existing_indexes(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, (table, columns) in INDEXES.items():
+        if name in existing_indexes(table):
+            op.drop_index(name, table_name=table)
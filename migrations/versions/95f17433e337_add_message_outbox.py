@@ -0,0 +1,55 @@
+"""add the outbox notifications are queued in before the worker fans them out
+
+Revision ID: 95f17433e337
+Revises: bb1032902bf5
+Create Date: 2026-10-18 17:03:48.000000
+
+Databases created with manage.py create_db after the model declared the
+table already have it, only its user key is made to cascade if it does not.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '95f17433e337'
+down_revision = 'bb1032902bf5'
+branch_labels = None
+depends_on = None
+
+# reflected SQLite foreign keys have no name, batch mode names them by this convention
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+USER_KEY = 'fk_message_outbox_user_id_user'
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    if 'message_outbox' not in inspector.get_table_names():
+        op.create_table(
+            'message_outbox',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('subject', sa.String(length=100), nullable=True),
+            sa.Column('text', sa.String(length=500), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('role_name', sa.String(length=20), nullable=True),
+            sa.Column('user_type', sa.String(length=20), nullable=True),
+            sa.Column('processed', sa.Boolean(), nullable=False),
+            sa.Column('creation_date', sa.TIMESTAMP(), server_default=sa.func.current_timestamp(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id'], name=USER_KEY, ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_message_outbox_processed', 'message_outbox', ['processed'])
+        return
+    for foreign_key in inspector.get_foreign_keys('message_outbox'):
+        if foreign_key['constrained_columns'] == ['user_id'] and foreign_key['options'].get('ondelete') != 'CASCADE':
+            name = foreign_key['name'] or NAMING_CONVENTION['fk'] % {
+                'table_name': 'message_outbox', 'column_0_name': 'user_id', 'referred_table_name': 'user'}
+            with op.batch_alter_table('message_outbox', naming_convention=NAMING_CONVENTION) as batch_op:
+                batch_op.drop_constraint(name, type_='foreignkey')
+                batch_op.create_foreign_key(USER_KEY, 'user', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    if 'message_outbox' in sa.inspect(op.get_bind()).get_table_names():
+        op.drop_table('message_outbox')
@@ -0,0 +1,41 @@
+"""add the per-user unread message counter and count what is already stored
+
+Revision ID: 9e7da7bbc65f
+Revises: 95f17433e337
+Create Date: 2026-10-18 17:21:05.000000
+
+The counter is recomputed from the message table whether or not the column
+existed, which also repairs counters that drifted.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e7da7bbc65f'
+down_revision = '95f17433e337'
+branch_labels = None
+depends_on = None
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade():
+    if 'unread_messages' not in existing_columns('user'):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.add_column(sa.Column('unread_messages', sa.Integer(), server_default='0', nullable=False))
+    user = sa.table('user', sa.column('id', sa.Integer), sa.column('unread_messages', sa.Integer))
+    message = sa.table('message', sa.column('id', sa.Integer), sa.column('user_id', sa.Integer),
+                       sa.column('read', sa.Boolean))
+    unread = sa.select([sa.func.count(message.c.id)]).where(
+        sa.and_(message.c.user_id == user.c.id, message.c.read == sa.false())).as_scalar()
+    op.execute(user.update().values(unread_messages=unread))
+
+
+def downgrade():
+    if 'unread_messages' in existing_columns('user'):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.drop_column('unread_messages')
@@ -0,0 +1,48 @@
+"""add the lowercased email logins and uniqueness checks are resolved on
+
+Revision ID: bb1032902bf5
+Revises: 07de413911e5
+Create Date: 2026-10-18 16:52:31.000000
+
+The column is added nullable and filled before its unique index is built, so
+two stored emails differing only in case fail the upgrade here rather than
+later, at login. Databases created with manage.py create_db after the model
+declared the column already have it, so it is skipped.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bb1032902bf5'
+down_revision = '07de413911e5'
+branch_labels = None
+depends_on = None
+
+
+def existing_columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'email_normalized' not in existing_columns('user'):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.add_column(sa.Column('email_normalized', sa.String(length=50), nullable=True))
+    user = sa.table('user', sa.column('email', sa.String), sa.column('email_normalized', sa.String))
+    op.execute(user.update().where(user.c.email_normalized.is_(None)).values(
+        email_normalized=sa.func.lower(sa.func.trim(user.c.email))))
+    if 'ix_user_email_normalized' not in existing_indexes('user'):
+        op.create_index('ix_user_email_normalized', 'user', ['email_normalized'], unique=True)
+
+
+def downgrade():
+    if 'ix_user_email_normalized' in existing_indexes('user'):
+        op.drop_index('ix_user_email_normalized', table_name='user')
+    if 'email_normalized' in existing_columns('user'):
+        with op.batch_alter_table('user') as batch_op:
+            batch_op.drop_column('email_normalized')
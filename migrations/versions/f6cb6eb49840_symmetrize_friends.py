@@ -0,0 +1,38 @@
+"""store every friendship in both directions and index who befriended a user
+
+Revision ID: f6cb6eb49840
+Revises: 18bf06efc768
+Create Date: 2026-10-18 18:12:40.000000
+
+Friendships stored in one direction only get their reverse row. Downgrading
+keeps those rows, the old code reads them as the friendships they are.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6cb6eb49840'
+down_revision = '18bf06efc768'
+branch_labels = None
+depends_on = None
+
+
+def existing_indexes(table):
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    if 'ix_friend_friend_id_user_id' not in existing_indexes('friend'):
+        op.create_index('ix_friend_friend_id_user_id', 'friend', ['friend_id', 'user_id'])
+    friend = sa.table('friend', sa.column('user_id', sa.Integer), sa.column('friend_id', sa.Integer))
+    reverse = friend.alias('reverse')
+    missing = sa.select([friend.c.friend_id, friend.c.user_id]).where(~sa.exists().where(
+        sa.and_(reverse.c.user_id == friend.c.friend_id, reverse.c.friend_id == friend.c.user_id)))
+    op.execute(friend.insert().from_select(['user_id', 'friend_id'], missing))
+
+
+def downgrade():
+    if 'ix_friend_friend_id_user_id' in existing_indexes('friend'):
+        op.drop_index('ix_friend_friend_id_user_id', table_name='friend')
@@ -18,9 +18,9 @@ class Expense(db.Model, AddUpdateDelete):
     description = db.Column(db.Text)
     cost = db.Column(db.Float, nullable=False)
     date = db.Column(db.Date, nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey('officer_details.user_id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('officer_details.id'), nullable=False)
     owner = db.Column(db.String(200), nullable=False)
-    # user = db.relationship('OfficerDetails', back_populates='expenses')
+    user = db.relationship('OfficerDetails', back_populates='expenses')
     state = db.Column(db.Boolean, nullable=False)
 
     def __init__(self, topic, invoice, description, cost, date, user_id, state, owner):
@@ -9,6 +9,8 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from flask_marshmallow import Marshmallow
 
+from links import Hyperlinks, URLFor
+
 ma = Marshmallow()
 
 class Camp(db.Model, AddUpdateDelete):
@@ -18,7 +20,7 @@ class Camp(db.Model, AddUpdateDelete):
     go_time = db.Column(db.DateTime, nullable=False)
     back_time = db.Column(db.DateTime, nullable=False)
     cost_per_person = db.Column(db.String(50))
-    users = db.relationship('UserPayments', cascade='all,delete', back_populates='camp')
+    users = db.relationship('UserPayments', cascade='all,delete', back_populates='camp', passive_deletes=True)
     report = db.relationship('CampReport', back_populates='camp', uselist=False)
 
     def __init__(self, subject, location, go_time, back_time, cost_per_person):
@@ -31,13 +33,17 @@ class Camp(db.Model, AddUpdateDelete):
 class UserPayments(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer, primary_key=True)
     paid_value = db.Column(db.String(50), default=0)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    camp_id = db.Column(db.Integer, db.ForeignKey('camp.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    camp_id = db.Column(db.Integer, db.ForeignKey('camp.id', ondelete='CASCADE'), nullable=False)
     rate = db.Column(db.Integer)
     description = db.Column(db.Text)
     # user = db.relationship('User', backref='payments')
     camp = db.relationship('Camp', back_populates='users')
 
+    __table_args__ = (
+        db.Index('ix_user_payments_camp_id_user_id', 'camp_id', 'user_id'),
+    )
+
     def __init__(self, paid_value, user_id, camp_id, rate, description):
         self.paid_value = paid_value
         self.user_id = user_id
@@ -55,9 +61,9 @@ class CampSchema(ma.Schema):
     go_time = fields.DateTime(required=True)
     back_time = fields.DateTime(required=True)
     cost_per_person = fields.String(required=True)
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "users": ma.URLFor('camp_api.userpaymentslistresource', camp_id="<id>")
+         "users": URLFor('camp_api.userpaymentslistresource', camp_id="<id>")
         }
     )
 
@@ -4,21 +4,25 @@ import uuid
 
 from models.UserModel import db
 
-from marshmallow import Schema, fields, validate
+from marshmallow import EXCLUDE, Schema, fields, validate
 from flask_marshmallow import Marshmallow
 
+from links import Hyperlinks, URLFor
+from normalization import add_normalized_columns
+
 ma = Marshmallow()
 
 
 class Document(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer, primary_key=True)
     topic = db.Column(db.String(50), nullable=False)
+    topic_normalized = db.Column(db.String(50), index=True)
     subject = db.Column(db.String(50))
     file_path = db.Column(db.String(50), nullable=False)
     level = db.Column(db.Integer)
     creation_date = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp(), nullable=False)
     type = db.Column(db.String(20), nullable=False)
-    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False, index=True)
     category = db.relationship('Category', back_populates='documents')
 
     def __init__(self, category_id, topic, file_path, subject, level, type):
@@ -29,8 +33,10 @@ class Document(db.Model, AddUpdateDelete):
         self.level = level
         self.type = type
 
+add_normalized_columns(Document, {'topic': 'topic_normalized'})
+
 class Book(Document):
-    id = db.Column(db.Integer, primary_key=True, db.ForeignKey('document.id'))
+    id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
     author = db.Column(db.String(50), nullable=False)
     publish_date = db.Column(db.Date, nullable=False)
     translator = db.Column(db.String(50))
@@ -42,7 +48,7 @@ class Book(Document):
         self.translator = translator
 
 class Voice(Document):
-    id = db.Column(db.Integer, primary_key=True, db.ForeignKey('document.id'))
+    id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
     speaker = db.Column(db.String(50), nullable=False)
     production_date = db.Column(db.Date, nullable=False)
 
@@ -52,7 +58,7 @@ class Voice(Document):
         self.production_date = production_date
 
 class Booklet(Document):
-    id = db.Column(db.Integer, primary_key=True, db.ForeignKey('document.id'))
+    id = db.Column(db.Integer, db.ForeignKey('document.id'), primary_key=True)
     author = db.Column(db.String(50), nullable=False)
     production_date = db.Column(db.Date, nullable=False)
 
@@ -92,11 +98,15 @@ class BookletSchema(DocumentSchema):
 
 class CategorySchema(ma.Schema):
     name = fields.String(required=True)
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
 			{
-			 "documents": ma.URLFor('document_api.documentlistresource', category_id='<id>')
+			 "documents": URLFor('document_api.documentlistresource', category_id='<id>')
 			}
 		)
 
 class TypeSchema(ma.Schema):
     type = fields.String(validate=validate.OneOf(choices=['voice', 'book', 'booklet']), required=True)
+
+    class Meta:
+        # q and the pagination arguments share the query string
+        unknown = EXCLUDE
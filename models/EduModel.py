@@ -5,6 +5,8 @@ from marshmallow import Schema, fields, validate
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from sqlalchemy_utils.types import UUIDType
 
+from links import Hyperlinks, URLFor
+from normalization import add_normalized_columns
 from models.UserModel import AddUpdateDelete, db
 
 ma = Marshmallow()
@@ -15,11 +17,11 @@ class Lecture(db.Model, AddUpdateDelete):
 	name = db.Column(db.String(50), nullable=False)
 	group = db.Column(db.String(50))
 	teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-	course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False)
+	course_id = db.Column(db.Integer, db.ForeignKey('course.id'), nullable=False, index=True)
 	course = db.relationship('Course', back_populates='lecture', uselist=False, cascade='all,delete')
-	sessions = db.relationship('LectureSession', back_populates='lecture', cascade='all,delete')
-	users = db.relationship('LectureUser', back_populates='lecture_user', cascade='all,delete')
-	exams = db.relationship('Exam', back_populates='lecture', cascade='all,delete')
+	sessions = db.relationship('LectureSession', back_populates='lecture', cascade='all,delete', passive_deletes=True)
+	users = db.relationship('LectureUser', back_populates='lecture_user', cascade='all,delete', passive_deletes=True)
+	exams = db.relationship('Exam', back_populates='lecture', cascade='all,delete', passive_deletes=True)
 	report = db.relationship('LectureReport', back_populates='lecture', uselist=False)
 
 	def __init__(self, name, group, teacher_id, course_id):
@@ -30,11 +32,12 @@ class Lecture(db.Model, AddUpdateDelete):
 
 class LectureUser(db.Model, AddUpdateDelete):
 	student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-	lecture_id = db.Column(db.Integer, db.ForeignKey('lecture.id'), nullable=False)
+	lecture_id = db.Column(db.Integer, db.ForeignKey('lecture.id', ondelete='CASCADE'), nullable=False)
 	lecture_user = db.relationship('Lecture', back_populates='users')
 
 	__table_args__ = (
 		db.PrimaryKeyConstraint('student_id', 'lecture_id'),
+		db.Index('ix_lecture_user_lecture_id_student_id', 'lecture_id', 'student_id'),
 	)
 
 	def __init__(self, student_id, lecture_id):
@@ -48,9 +51,9 @@ class LectureSession(db.Model, AddUpdateDelete):
 	subject = db.Column(db.String(100))
 	number = db.Column(db.Integer)
 	location = db.Column(db.String(50))
-	lecture_id = db.Column(db.Integer, db.ForeignKey('lecture.id'), nullable=False)
+	lecture_id = db.Column(db.Integer, db.ForeignKey('lecture.id', ondelete='CASCADE'), nullable=False, index=True)
 	lecture = db.relationship('Lecture', back_populates='sessions')
-	users = db.relationship('LectureUserSession', back_populates='lecture_session')
+	users = db.relationship('LectureUserSession', back_populates='lecture_session', passive_deletes=True)
 	def __init__(self, datetime, end_time, subject, location, lecture_id):
 		self.datetime = datetime
 		self.end_time = end_time
@@ -60,8 +63,8 @@ class LectureSession(db.Model, AddUpdateDelete):
 		self.lecture_id = lecture_id
 
 class LectureUserSession(db.Model, AddUpdateDelete):
-	student_id = db.Column(db.Integer, db.ForeignKey('lecture_user.student_id'), nullable=False)
-	session_id = db.Column(db.Integer, db.ForeignKey('lecture_session.id'), nullable=False)
+	student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+	session_id = db.Column(db.Integer, db.ForeignKey('lecture_session.id', ondelete='CASCADE'), nullable=False)
 	description = db.Column(db.Text)
 	present = db.Column(db.Boolean, default=False)
 	homework_mark = db.Column(db.Integer)
@@ -69,6 +72,7 @@ class LectureUserSession(db.Model, AddUpdateDelete):
     
 	__table_args__ = (
 		db.PrimaryKeyConstraint('student_id', 'session_id'),
+		db.Index('ix_lecture_user_session_session_id_student_id', 'session_id', 'student_id'),
     )
 
 	def __init__(self, student_id, session_id, description, present, homework_mark):
@@ -81,6 +85,7 @@ class LectureUserSession(db.Model, AddUpdateDelete):
 class Course(db.Model, AddUpdateDelete):
 	id = db.Column(db.Integer, primary_key=True)
 	name = db.Column(db.String(50), nullable=False)
+	name_normalized = db.Column(db.String(50), index=True)
 	fac = db.Column(db.Integer, nullable=False)
 	grade = db.Column(db.Integer, nullable=False)
 	major = db.Column(db.String(50))
@@ -92,14 +97,16 @@ class Course(db.Model, AddUpdateDelete):
 		self.grade = grade
 		self.major = major
 
+add_normalized_columns(Course, {'name': 'name_normalized'})
+
 class Exam(db.Model, AddUpdateDelete):
 	id = db.Column(db.Integer, primary_key=True)
 	datetime = db.Column(db.DateTime, nullable=False) # required
 	type = db.Column(db.String(50), nullable=False)
 	file = db.Column(db.String(100))
-	lecture_id = db.Column(db.Integer, db.ForeignKey('lecture.id'), nullable=False)
+	lecture_id = db.Column(db.Integer, db.ForeignKey('lecture.id', ondelete='CASCADE'), nullable=False, index=True)
 	lecture = db.relationship('Lecture', back_populates='exams')
-	results = db.relationship('ExamResult', back_populates='exam', cascade='all,delete')
+	results = db.relationship('ExamResult', back_populates='exam', cascade='all,delete', passive_deletes=True)
 
 	def __init__(self, datetime, type, file, lecture_id):
 		self.datetime = datetime
@@ -109,12 +116,13 @@ class Exam(db.Model, AddUpdateDelete):
 
 class ExamResult(db.Model, AddUpdateDelete):
 	score = db.Column(db.Integer, nullable=False)
-	student_id = db.Column(db.Integer, db.ForeignKey('lecture_user.student_id'), nullable=False)
-	exam_id = db.Column(db.Integer, db.ForeignKey('exam.id'), nullable=False)
+	student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+	exam_id = db.Column(db.Integer, db.ForeignKey('exam.id', ondelete='CASCADE'), nullable=False)
 	exam = db.relationship('Exam', back_populates='results')
     
 	__table_args__ = (
 		db.PrimaryKeyConstraint('student_id', 'exam_id'),
+		db.Index('ix_exam_result_exam_id_student_id', 'exam_id', 'student_id'),
     )
 
 	def __init__(self, score, student_id, exam_id):
@@ -130,11 +138,11 @@ class LectureSchema(ma.Schema):
 	end_time = fields.Time(required=True)
 	# teacher_username = fields.String(required=True, validate=validate.Regexp(regex=r'^(?=.{5,20}$)(?![_.])(?!.*[_.]{2})[a-zA-Z0-9._]+(?<![_.])$'))
 	teacher_id = fields.Integer(required=True)
-	_links = ma.Hyperlinks(
+	_links = Hyperlinks(
 			{
-			 "sessions": ma.URLFor('education_api.lecturesessionlistresource', course_id='<course_id>', lecture_id='<id>'),
-			 "users": ma.URLFor('education_api.lectureuserlistresource', course_id='<course_id>', lecture_id='<id>'),
-			 "exams": ma.URLFor('education_api.examlistresource', course_id='<course_id>', lecture_id='<id>')
+			 "sessions": URLFor('education_api.lecturesessionlistresource', course_id='<course_id>', lecture_id='<id>'),
+			 "users": URLFor('education_api.lectureuserlistresource', course_id='<course_id>', lecture_id='<id>'),
+			 "exams": URLFor('education_api.examlistresource', course_id='<course_id>', lecture_id='<id>')
 			}
 		)
 
@@ -167,9 +175,9 @@ class CourseSchema(ma.Schema):
 	fac = fields.Integer(required=True, validate=validate.Range(min=1, max=4))
 	grade = fields.Integer(required=True)
 	major = fields.String()
-	_links = ma.Hyperlinks(
+	_links = Hyperlinks(
 			{
-			 "lectures": ma.URLFor('education_api.lecturelistresource', course_id='<id>')
+			 "lectures": URLFor('education_api.lecturelistresource', course_id='<id>')
 			}
 		)
 
@@ -177,9 +185,9 @@ class ExamSchema(ma.Schema):
 	datetime = fields.DateTime(required=True) # required
 	type = fields.String(required=True, validate=validate.OneOf(choices=['quiz', 'midterm', 'final']))
 	file = fields.String()
-	_links = ma.Hyperlinks(
+	_links = Hyperlinks(
 			{
-			 "results": ma.URLFor('education_api.examresultlistresource', course_id='<course_id>', lecture_id='<lecture_id>', exam_id='<id>')
+			 "results": URLFor('education_api.examresultlistresource', course_id='<lecture.course_id>', lecture_id='<lecture_id>', exam_id='<id>')
 			}
 		)
 
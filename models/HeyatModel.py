@@ -9,6 +9,9 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from flask_marshmallow import Marshmallow
 
+from links import Hyperlinks, URLFor
+from normalization import add_normalized_columns
+
 ma = Marshmallow()
 
 
@@ -16,12 +19,13 @@ class Heyat(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50), nullable=False)
     reason = db.Column(db.String(50), nullable=False)
+    reason_normalized = db.Column(db.String(50), index=True)
     datetime = db.Column(db.DateTime, nullable=False) # required
     compere = db.Column(db.String(50))	# mojri
     speaker = db.Column(db.String(50))	# sokhanran
     singer = db.Column(db.String(50))
     meal = db.Column(db.String(50))
-    users = db.relationship('HeyatUsers', cascade='all,delete', back_populates='heyat')
+    users = db.relationship('HeyatUsers', cascade='all,delete', back_populates='heyat', passive_deletes=True)
 
     report = db.relationship('HeyatReport', back_populates='heyat', uselist=False)
 
@@ -34,9 +38,11 @@ class Heyat(db.Model, AddUpdateDelete):
         self.singer = singer
         self.meal = meal
 
+add_normalized_columns(Heyat, {'reason': 'reason_normalized'})
+
 class HeyatUsers(db.Model, AddUpdateDelete):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
-    heyat_id = db.Column(db.Integer, db.ForeignKey('heyat.id'))
+    heyat_id = db.Column(db.Integer, db.ForeignKey('heyat.id', ondelete='CASCADE'))
     rate = db.Column(db.Integer)
     description = db.Column(db.Text)
     present = db.Column(db.Boolean)
@@ -44,6 +50,7 @@ class HeyatUsers(db.Model, AddUpdateDelete):
 
     __table_args__ = (
         db.PrimaryKeyConstraint('user_id', 'heyat_id'),
+        db.Index('ix_heyat_users_heyat_id_user_id', 'heyat_id', 'user_id'),
     )
     
     def __init__(self, user_id, heyat_id, present, rate, description):
@@ -62,9 +69,9 @@ class HeyatSchema(ma.Schema):
     speaker = fields.String()
     singer = fields.String()
     meal = fields.String()
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "users": ma.URLFor('heyat_api.heyatuserslistresource', heyat_id="<id>")
+         "users": URLFor('heyat_api.heyatuserslistresource', heyat_id="<id>")
         }
     )
 
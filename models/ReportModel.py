@@ -5,6 +5,7 @@ from marshmallow import Schema, fields, validate
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 from sqlalchemy_utils.types import UUIDType
 
+from links import Hyperlinks, URLFor
 from models.UserModel import AddUpdateDelete, db
 
 ma = Marshmallow()
@@ -64,7 +65,7 @@ class Multimedia(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer, primary_key=True)
     path = db.Column(db.String(50), nullable=False)
     format = db.Column(db.String(20), nullable=False)
-    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=False)
+    report_id = db.Column(db.Integer, db.ForeignKey('report.id'), nullable=False, index=True)
     report = db.relationship('Report', back_populates='multimedias')
 
     def __init__(self, path, format, report_id):
@@ -76,9 +77,9 @@ class Multimedia(db.Model, AddUpdateDelete):
 class ReportSchema(ma.Schema):
     description = fields.String()
     creation_datetime = fields.DateTime(dump_only=True)
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "multimedias": ma.URLFor('report_api.multimedialistresource', report_id='<id>')
+         "multimedias": URLFor('report_api.multimedialistresource', report_id='<id>')
          }
     )
 
@@ -89,8 +90,8 @@ class ReportArgsSchema(ma.Schema):
 class MultimediaSchema(ma.Schema):
     path = fields.String(required=True)
     format = fields.String(required=True, validate=validate.OneOf(choices=['mp3', 'mp4', 'xlsx', 'docx', 'pdf']))
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-            "self": ma.URLFor('report_api.multimediaresource', report_id='<report_id>', multimedia_id='<id>')
+            "self": URLFor('report_api.multimediaresource', report_id='<report_id>', multimedia_id='<id>')
         }
     )
\ No newline at end of file
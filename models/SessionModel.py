@@ -9,6 +9,8 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from flask_marshmallow import Marshmallow
 
+from links import Hyperlinks, URLFor
+
 ma = Marshmallow()
 
 class Session(db.Model, AddUpdateDelete):
@@ -17,8 +19,9 @@ class Session(db.Model, AddUpdateDelete):
     datetime = db.Column(db.DateTime(), nullable=False)
     done = db.Column(db.Boolean, default=False)
     creation_date = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp(), nullable=False)
-    details = db.relationship('SessionDetails', cascade='all,delete', uselist=False, back_populates='session')
-    users = db.relationship('SessionUser', cascade='all,delete', back_populates='session')
+    details = db.relationship('SessionDetails', cascade='all,delete', uselist=False, back_populates='session',
+                              passive_deletes=True)
+    users = db.relationship('SessionUser', cascade='all,delete', back_populates='session', passive_deletes=True)
     # type_id = db.Column(db.Integer, default=3)
     
     # __table_args__ = (
@@ -32,7 +35,7 @@ class Session(db.Model, AddUpdateDelete):
         self.done = done
 
 class SessionDetails(db.Model, AddUpdateDelete):
-    session_id = db.Column(db.Integer,db.ForeignKey('session.id'), primary_key=True)
+    session_id = db.Column(db.Integer,db.ForeignKey('session.id', ondelete='CASCADE'), primary_key=True)
     session = db.relationship('Session', back_populates='details')
     number = db.Column(db.Integer)
     kind = db.Column(db.String(50)) # constraint
@@ -61,12 +64,13 @@ class SessionDetails(db.Model, AddUpdateDelete):
 class SessionUser(db.Model, AddUpdateDelete):
     __tablename__ = 'session_user'
     user_id = db.Column(db.Integer,db.ForeignKey('user.id'))
-    session_id = db.Column(db.Integer,db.ForeignKey('session.id'))
+    session_id = db.Column(db.Integer,db.ForeignKey('session.id', ondelete='CASCADE'))
     session = db.relationship('Session', back_populates='users')
     present = db.Column(db.Boolean)
 
     __table_args__ = (
         db.PrimaryKeyConstraint('user_id', 'session_id'),
+        db.Index('ix_session_user_session_id_user_id', 'session_id', 'user_id'),
     )
 
     def __init__(self, user_id, session_id, present):
@@ -81,17 +85,20 @@ class Task(db.Model, AddUpdateDelete):
     done_time = db.Column(db.DateTime)
     priority = db.Column(db.String(50), default='medium')
     description = db.Column(db.String(100))
-    user_id = db.Column(db.Integer, db.ForeignKey('session_user.user_id'), nullable=False)
-    session_id = db.Column(db.Integer, db.ForeignKey('session_user.session_id'), nullable=False)
-    uis = db.relationship('SessionUser', backref='tasks', foreign_keys=[user_id, session_id])
-    deadlines = db.relationship('Deadline', back_populates='task')
+    # both reference session_user through the composite key below, neither column is unique there on its own
+    user_id = db.Column(db.Integer, nullable=False)
+    session_id = db.Column(db.Integer, nullable=False)
+    uis = db.relationship('SessionUser', backref=db.backref('tasks', passive_deletes=True), foreign_keys=[user_id, session_id])
+    deadlines = db.relationship('Deadline', back_populates='task', passive_deletes=True)
 
     # type_id = db.Column(db.Integer, default=4)
 
     # report = db.relationship('Report', backref='task', uselist=False)
 
     __table_args__ = (
-        db.ForeignKeyConstraint(["user_id", "session_id"], ["session_user.user_id", "session_user.session_id"]),
+        db.ForeignKeyConstraint(["user_id", "session_id"], ["session_user.user_id", "session_user.session_id"],
+                                ondelete='CASCADE'),
+        db.Index('ix_task_user_id_session_id', 'user_id', 'session_id'),
         # db.ForeignKeyConstraint(["id", "type_id"], ["report.id", "report.type_id"]),
     )
 
@@ -109,7 +116,7 @@ class Task(db.Model, AddUpdateDelete):
 class Deadline(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer,primary_key=True)
     expiration_datetime = db.Column(db.DateTime, nullable=False) # required
-    task_id = db.Column(db.Integer,db.ForeignKey('task.id'))
+    task_id = db.Column(db.Integer,db.ForeignKey('task.id', ondelete='CASCADE'), index=True)
     task = db.relationship('Task', back_populates='deadlines')
 
     def __init__(self, task_id, expiration_datetime):
@@ -121,10 +128,10 @@ class SessionSchema(ma.Schema):
     datetime = fields.DateTime(required=True)
     done = fields.Boolean()
     
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "details": ma.URLFor('session_api.sessiondetailsresource', session_id="<id>"),
-         "users": ma.URLFor('session_api.sessionuserslistresource', session_id="<id>")
+         "details": URLFor('session_api.sessiondetailsresource', session_id="<id>"),
+         "users": URLFor('session_api.sessionuserslistresource', session_id="<id>")
         }
     )
     class Meta:
@@ -145,9 +152,9 @@ class SessionDetailsSchema(ma.Schema):
 class SessionUserSchema(ma.Schema):
     user_id = fields.Integer(required=True)
     present = fields.Boolean()
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "tasks": ma.URLFor('session_api.tasklistresource', session_id="<session_id>", user_id="<user_id>"),
+         "tasks": URLFor('session_api.tasklistresource', session_id="<session_id>", user_id="<user_id>"),
         }
     )
 
@@ -158,9 +165,9 @@ class TaskSchema(ma.Schema):
     done = fields.Boolean()
     done_time = fields.DateTime()
 
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "deadlines": ma.URLFor('session_api.deadlinelistresource', session_id="<session_id>", user_id="<user_id>", task_id="<id>"),
+         "deadlines": URLFor('session_api.deadlinelistresource', session_id="<session_id>", user_id="<user_id>", task_id="<id>"),
         }
     )
     class Meta:
@@ -9,6 +9,8 @@ from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from flask_marshmallow import Marshmallow
 
+from links import Hyperlinks, URLFor
+
 ma = Marshmallow()
 
 
@@ -19,7 +21,7 @@ class Sport(db.Model, AddUpdateDelete):
     datetime = db.Column(db.DateTime, nullable=False) # required
     users = db.relationship('SportUsers', cascade='all,delete', back_populates='sport')
 
-    report = db.relationship('SportReport', back_populates='sport', uselist=False)
+    # report = db.relationship('SportReport', back_populates='sport', uselist=False)
 
     def __init__(self, type, datetime, venue):
         self.type = type
@@ -36,6 +38,7 @@ class SportUsers(db.Model, AddUpdateDelete):
 
     __table_args__ = (
         db.PrimaryKeyConstraint('user_id', 'sport_id'),
+        db.Index('ix_sport_users_sport_id_user_id', 'sport_id', 'user_id'),
     )
     
     def __init__(self, user_id, sport_id, present, rate, description):
@@ -50,9 +53,9 @@ class SportSchema(ma.Schema):
     type = fields.String(required=True, validate=validate.OneOf(choices=['football', 'judo']))
     venue = fields.String(required=True)
     datetime = fields.DateTime(required=True)
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "users": ma.URLFor('sport_api.sportuserslistresource', sport_id="<id>")
+         "users": URLFor('sport_api.sportuserslistresource', sport_id="<id>")
         }
     )
 
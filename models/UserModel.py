@@ -1,48 +1,126 @@
-from marshmallow import Schema, fields, validate
+from marshmallow import EXCLUDE, Schema, ValidationError, fields, validate, validates_schema
 from flask_marshmallow import Marshmallow
 from marshmallow_sqlalchemy import SQLAlchemyAutoSchema
 
 from sqlalchemy_utils.types import UUIDType
+from flask import g, has_request_context, jsonify, make_response
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import aliased, selectinload, validates
 
-from argon2 import PasswordHasher
 from itsdangerous import (TimedJSONWebSignatureSerializer as Serializer, BadSignature, SignatureExpired)
 
 from enum import Enum
+import sqlite3
 import uuid
 
 import config
+import status
+import hashing
+from hashing import HashPoolBusy, hash_pool
+from links import Hyperlinks, URLFor
+from normalization import add_normalized_columns, escape_like, normalize_text
+from streams import message_hub
 
 ma = Marshmallow()
-HASHER = PasswordHasher()
 db = SQLAlchemy()
 
+@event.listens_for(Engine, 'connect')
+def configure_sqlite_connection(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        # SQLite ignores ON DELETE CASCADE unless asked per connection
+        cursor.execute('PRAGMA foreign_keys=ON')
+        # and answers a prefix LIKE from an index only when it is case sensitive, the
+        # normalized search columns are lowercase already, usernames match case sensitively
+        cursor.execute('PRAGMA case_sensitive_like=ON')
+        cursor.close()
+
+
+def unit_of_work_active():
+    return has_request_context() and g.get('unit_of_work', False)
+
+
+def commit():
+    """commit now, or only flush while the request commits once at its end"""
+    if unit_of_work_active():
+        return db.session.flush()
+    return db.session.commit()
+
+
+def on_commit(callback, *args):
+    """run callback once the changes made so far are committed"""
+    if unit_of_work_active():
+        g.setdefault('commit_callbacks', []).append((callback, args))
+    else:
+        callback(*args)
+
+
+def init_unit_of_work(app):
+    """one transaction per request when UNIT_OF_WORK is set, rolled back on any error response"""
+    @app.before_request
+    def begin_unit_of_work():
+        g.unit_of_work = app.config['UNIT_OF_WORK']
+
+    @app.after_request
+    def finish_unit_of_work(response):
+        if not g.get('unit_of_work') or response.is_streamed:
+            # a streamed export still reads through the transaction, teardown ends it
+            return response
+        g.unit_of_work = False
+        if response.status_code >= 400:
+            db.session.rollback()
+            return response
+        try:
+            db.session.commit()
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            return make_response(jsonify({"error": str(e)}), status.HTTP_400_BAD_REQUEST)
+        for callback, args in g.pop('commit_callbacks', []):
+            callback(*args)
+        return response
+
+    @app.teardown_request
+    def abort_unit_of_work(exception):
+        # after_request is skipped when the view raised
+        if g.get('unit_of_work'):
+            db.session.rollback()
+
+
 class AddUpdateDelete():
     def add(self, resource):
         db.session.add(resource)
-        return db.session.commit()
+        return commit()
 
     def update(self):
-        return db.session.commit()
+        return commit()
 
     def delete(self, resource):
         db.session.delete(resource)
-        return db.session.commit()
+        return commit()
 
 # ---------- Models ----------- #
 class User(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer,primary_key=True)
     username = db.Column(db.String(50), nullable=False, unique=True)
     email = db.Column(db.String(50), nullable=False, unique=True)
+    # lowercased copy of email, kept in sync by set_email_normalized
+    email_normalized = db.Column(db.String(50), unique=True, index=True)
     password = db.Column(db.String(100), nullable=False)
-    type = db.Column(db.String(20), nullable=False)
+    type = db.Column(db.String(20), nullable=False, index=True)
     creation_date = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp(), nullable=False)
     authorized = db.Column(db.Boolean, default=0, nullable=False)
-    details = db.relationship('UserDetails', cascade='all,delete', uselist=False, back_populates='user')
-    dials = db.relationship('Dial', cascade='all,delete', back_populates='user')
-    grades = db.relationship('Grade', cascade='all,delete', back_populates='user')
-    messages = db.relationship('Message', cascade='all,delete', back_populates='user')
-    roles = db.relationship('UserRoles', cascade='all,delete', back_populates='user')
+    role_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # maintained alongside Message inserts, reads and deletes, see unread_counter_update
+    unread_messages = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    # children go with ON DELETE CASCADE instead of being loaded and deleted one by one
+    details = db.relationship('UserDetails', cascade='all,delete', uselist=False, back_populates='user', passive_deletes=True)
+    dials = db.relationship('Dial', cascade='all,delete', back_populates='user', passive_deletes=True)
+    grades = db.relationship('Grade', cascade='all,delete', back_populates='user', passive_deletes=True)
+    messages = db.relationship('Message', cascade='all,delete', back_populates='user', passive_deletes=True)
+    roles = db.relationship('UserRoles', cascade='all,delete', back_populates='user', passive_deletes=True)
 
     # __mapper_args__ = {'polymorphic_identity': 'user',
     #                     'polymorphic_on': type}
@@ -53,27 +131,112 @@ class User(db.Model, AddUpdateDelete):
         self.email = email
         self.type = type
 
+    @staticmethod
+    def normalize_email(email):
+        return email.strip().lower()
+
+    @validates('email')
+    def set_email_normalized(self, key, email):
+        self.email_normalized = User.normalize_email(email)
+        return email
+
+    @classmethod
+    def find_by_username_or_email(cls, username=None, email=None):
+        """users owning username or email, resolved in one indexed query"""
+        conditions = []
+        if username is not None:
+            conditions.append(cls.username == username)
+        if email is not None:
+            conditions.append(cls.email_normalized == cls.normalize_email(email))
+        if not conditions:
+            return []
+        return cls.query.filter(db.or_(*conditions)).all()
+
+    @classmethod
+    def search(cls, term, by=None):
+        """users matching term, each field answered from its own index and the ids unioned"""
+        prefix = escape_like(term) + '%'
+        selects = []
+        if by in (None, 'username'):
+            selects.append(db.select([cls.id.label('user_id')]).where(cls.username.like(prefix, escape='\\')))
+        if by in (None, 'email'):
+            email_prefix = escape_like(cls.normalize_email(term)) + '%'
+            selects.append(db.select([cls.id.label('user_id')]).where(
+                cls.email_normalized.like(email_prefix, escape='\\')))
+        if by in (None, 'nat_id'):
+            nat_id_prefix = escape_like(normalize_text(term)) + '%'
+            selects.append(db.select([UserDetails.user_id]).where(
+                UserDetails.nat_id_normalized.like(nat_id_prefix, escape='\\')))
+        if by in (None, 'name'):
+            selects.append(db.select([UserDetails.user_id]).where(UserDetails.name_matches(term)))
+        # joined as a derived table, MySQL runs "id IN (... UNION ...)" as a dependent subquery per user row
+        matches = (selects[0] if len(selects) == 1 else db.union(*selects)).alias('matches')
+        return cls.query.join(matches, cls.id == matches.c.user_id).order_by(cls.id)
+
+    @classmethod
+    def load_profile(cls, user_id):
+        """(user, typed details) with dials, grades and roles loaded, in five queries whatever their size"""
+        user = cls.query.options(selectinload(cls.dials), selectinload(cls.grades),
+                                 selectinload(cls.roles)).get(user_id)
+        if user is None:
+            return None, None
+        details_class = StudentDetails if user.type == 'student' else OfficerDetails
+        return user, details_class.query.filter_by(user_id=user_id).first()
+
+    @classmethod
+    def find_by_login(cls, username_or_email):
+        users = cls.find_by_username_or_email(username=username_or_email, email=username_or_email)
+        if not users:
+            return None
+        return users[0]
+
     # I save the hashed password
     @staticmethod
     def set_password(password):
-        return HASHER.hash(password)
+        return hash_pool.run(hashing.hash_password, password)
 
     def verify_password(self, password):
-        return HASHER.verify(self.password, password)
-
-    def generate_auth_token(self, expiration = 360000):
+        verified, needs_rehash = hash_pool.run(hashing.verify_password, self.password, password)
+        if verified and needs_rehash:
+            # PasswordHasher parameters changed since this hash was stored
+            try:
+                self.password = User.set_password(password)
+            except HashPoolBusy:
+                # the login already succeeded, the hash is upgraded on a quieter one
+                return verified
+            self.update()
+        return verified
+
+    def generate_auth_token(self, expiration = 360000, claims = False):
         s = Serializer(config.SECRET_KEY, expires_in=expiration)
-        return s.dumps({ 'id': self.id })
+        data = { 'id': self.id }
+        if claims:
+            # lets token auth authorize without touching the database
+            data['authorized'] = bool(self.authorized)
+            data['roles'] = [role.role_name for role in self.roles]
+            data['rv'] = self.role_version
+        return s.dumps(data)
 
     @staticmethod
-    def verify_auth_token(token):
+    def bump_role_version(user_id):
+        # invalidates claim tokens issued before a role or authorization change
+        User.query.filter_by(id=user_id).update({User.role_version: User.role_version + 1}, synchronize_session=False)
+
+    @staticmethod
+    def load_auth_token(token):
         s = Serializer(config.SECRET_KEY)
         try:
-            data = s.loads(token)
+            return s.loads(token)
         except SignatureExpired:
             return None # valid token, but expired
         except BadSignature:
             return None # invalid token
+
+    @staticmethod
+    def verify_auth_token(token):
+        data = User.load_auth_token(token)
+        if data is None:
+            return None
         user = User.query.get(data['id'])
         return user
     
@@ -95,7 +258,7 @@ class User(db.Model, AddUpdateDelete):
 
 class UserDetails(db.Model, AddUpdateDelete):
     # id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer,db.ForeignKey('user.id'), primary_key=True)
+    user_id = db.Column(db.Integer,db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
     user = db.relationship('User', back_populates='details')
     profile_photo = db.Column(db.String(50))
     firstname = db.Column(db.String(50))
@@ -104,6 +267,10 @@ class UserDetails(db.Model, AddUpdateDelete):
     birth_date = db.Column(db.DateTime)
     nat_id = db.Column(db.String(10))
     fathername = db.Column(db.String(50))
+    # search copies of the columns above, see normalization.py
+    firstname_normalized = db.Column(db.String(50))
+    lastname_normalized = db.Column(db.String(50))
+    nat_id_normalized = db.Column(db.String(10), index=True)
 
     def __init__(self, user_id, firstname, lastname, instagram, birth_date, nat_id, fathername, profile_photo):
         self.user_id = user_id
@@ -122,8 +289,27 @@ class UserDetails(db.Model, AddUpdateDelete):
             return False
         return True
 
+    @staticmethod
+    def name_matches(term):
+        """condition finding term anywhere in firstname or lastname"""
+        term = normalize_text(term)
+        if db.session.get_bind().dialect.name == 'mysql':
+            # answered by the ngram FULLTEXT index below
+            phrase = '"{}"'.format(term.replace('"', ' '))
+            return db.text('MATCH (user_details.firstname_normalized, user_details.lastname_normalized) '
+                           'AGAINST (:phrase IN BOOLEAN MODE)').bindparams(phrase=phrase)
+        pattern = '%' + escape_like(term) + '%'
+        return db.or_(UserDetails.firstname_normalized.like(pattern, escape='\\'),
+                      UserDetails.lastname_normalized.like(pattern, escape='\\'))
+
+add_normalized_columns(UserDetails, {'firstname': 'firstname_normalized', 'lastname': 'lastname_normalized',
+                                     'nat_id': 'nat_id_normalized'})
+
+db.Index('ix_user_details_name', UserDetails.firstname_normalized, UserDetails.lastname_normalized,
+         mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+
 class StudentDetails(UserDetails):
-    id = db.Column(db.Integer, db.ForeignKey('user_details.user_id'), primary_key=True)
+    id = db.Column(db.Integer, db.ForeignKey('user_details.user_id', ondelete='CASCADE'), primary_key=True)
     school = db.Column(db.String(50))
     major = db.Column(db.String(50))
     last_average = db.Column(db.Float)
@@ -139,7 +325,7 @@ class StudentDetails(UserDetails):
         self.group = group
 
 class OfficerDetails(UserDetails):
-    id = db.Column(db.Integer,db.ForeignKey('user_details.user_id'), primary_key=True)
+    id = db.Column(db.Integer,db.ForeignKey('user_details.user_id', ondelete='CASCADE'), primary_key=True)
     coop_start_date = db.Column(db.DateTime, nullable=False)
     work_experience = db.Column(db.Integer, nullable=False)
     expenses = db.relationship('Expense', back_populates='user')
@@ -164,12 +350,14 @@ class RolesEnum(Enum):
 
 class UserRoles(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer,primary_key=True)
-    user_id = db.Column(db.Integer,db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer,db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     user = db.relationship('User', back_populates='roles')
     role_name = db.Column(db.String(20))
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'role_name'),
+        # recipients of role broadcasts
+        db.Index('ix_user_roles_role_name_user_id', 'role_name', 'user_id'),
     )
 
     @classmethod
@@ -187,7 +375,7 @@ class Dial(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer,primary_key=True)
     number = db.Column(db.String(11), nullable=False)
     type = db.Column(db.String(50), nullable=False)
-    user_id = db.Column(db.Integer,db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer,db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     user = db.relationship('User', back_populates='dials')
 
 
@@ -210,7 +398,7 @@ class Grade(db.Model, AddUpdateDelete):
     college = db.Column(db.String(100), nullable=False)
     degree = db.Column(db.String(50), nullable=False)
     pic = db.Column(db.String(100))
-    user_id = db.Column(db.Integer,db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer,db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
     user = db.relationship('User', back_populates='grades')
 
     @classmethod
@@ -233,17 +421,83 @@ class Message(db.Model, AddUpdateDelete):
     subject = db.Column(db.String(100))
     text = db.Column(db.String(500))
     read = db.Column(db.Boolean, default=0)
-    user_id = db.Column(db.Integer,db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer,db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
     user = db.relationship('User', back_populates='messages')
-    notification = db.relationship('Notification', back_populates='message', uselist=False, cascade='all,delete')
+    notification = db.relationship('Notification', back_populates='message', uselist=False, cascade='all,delete',
+                                   passive_deletes=True)
+
+    __table_args__ = (
+        # a user's messages, optionally only the read or unread ones
+        db.Index('ix_message_user_id_read', 'user_id', 'read'),
+    )
 
     def __init__(self, subject, text, user_id):
         self.subject = subject
         self.text = text
         self.user_id = user_id
 
+    def add(self, resource):
+        result = super().add(resource)
+        on_commit(message_hub.publish, resource.user_id)
+        return result
+
+    @classmethod
+    def mark_read(cls, user_id, ids=None, ranges=None, before=None):
+        """mark a user's unread messages as read with one UPDATE, return how many changed"""
+        conditions = []
+        if ids:
+            conditions.append(cls.id.in_(ids))
+        for first, last in ranges or []:
+            conditions.append(cls.id.between(first, last))
+        if before is not None:
+            conditions.append(cls.id < before)
+        if not conditions:
+            return 0
+        updated = cls.query.filter_by(user_id=user_id, read=False).filter(db.or_(*conditions)).update(
+            {cls.read: True}, synchronize_session=False)
+        if updated:
+            db.session.execute(unread_counter_update(-updated, User.__table__.c.id == user_id))
+        commit()
+        return updated
+
+
+def unread_counter_update(delta, *criteria):
+    """UPDATE adding delta to User.unread_messages of the users matching criteria"""
+    user = User.__table__
+    return user.update().where(db.and_(*criteria)).values(unread_messages=user.c.unread_messages + delta)
+
+
+@event.listens_for(Message, 'after_insert')
+def count_inserted_message(mapper, connection, target):
+    if not target.read:
+        connection.execute(unread_counter_update(1, User.__table__.c.id == target.user_id))
+
+
+@event.listens_for(Message, 'after_delete')
+def uncount_deleted_message(mapper, connection, target):
+    if not target.read:
+        connection.execute(unread_counter_update(-1, User.__table__.c.id == target.user_id))
+
+class MessageOutbox(db.Model, AddUpdateDelete):
+    """a message waiting to be fanned out into Message rows by the outbox worker"""
+    id = db.Column(db.Integer,primary_key=True)
+    subject = db.Column(db.String(100))
+    text = db.Column(db.String(500))
+    user_id = db.Column(db.Integer,db.ForeignKey('user.id', ondelete='CASCADE')) # a single recipient
+    role_name = db.Column(db.String(20)) # or every user with this role
+    user_type = db.Column(db.String(20)) # or every user of this type
+    processed = db.Column(db.Boolean, default=False, nullable=False, index=True)
+    creation_date = db.Column(db.TIMESTAMP, server_default=db.func.current_timestamp(), nullable=False)
+
+    def __init__(self, subject, text, user_id=None, role_name=None, user_type=None):
+        self.subject = subject
+        self.text = text
+        self.user_id = user_id
+        self.role_name = role_name
+        self.user_type = user_type
+
 class Notification(db.Model, AddUpdateDelete):
-    message_id = db.Column(db.Integer,db.ForeignKey('message.id'), primary_key=True)
+    message_id = db.Column(db.Integer,db.ForeignKey('message.id', ondelete='CASCADE'), primary_key=True)
     message = db.relationship('Message', back_populates='notification')
     # text = db.relationship('Message', back_populates='subject', foreign_keys=[message_id])
     text = db.Column(db.String(100))
@@ -254,7 +508,7 @@ class Notification(db.Model, AddUpdateDelete):
 # --------- Schemas --------- #
 class NotificationSchema(ma.Schema):
     text = fields.String(required=True)
-    message = ma.URLFor('user_api.messageresource', message_id='<message_id>')
+    message = URLFor('user_api.messageresource', message_id='<message_id>')
 
 class UserSchema(ma.Schema):
     # id = fields.Integer(dump_only=True)
@@ -264,13 +518,13 @@ class UserSchema(ma.Schema):
     email = fields.Email(required=True)
     creation_date = fields.DateTime()
     
-    _links = ma.Hyperlinks(
+    _links = Hyperlinks(
         {
-         "details": ma.URLFor('user_api.userdetailsresource'),
-         "dials": ma.URLFor('user_api.diallistresource'),
-         "roles": ma.URLFor('user_api.rolelistresource'),
-         "grades": ma.URLFor('user_api.diallistresource'),
-         "messages": ma.URLFor('user_api.messagelistresource')
+         "details": URLFor('user_api.userdetailsresource'),
+         "dials": URLFor('user_api.diallistresource'),
+         "roles": URLFor('user_api.rolelistresource'),
+         "grades": URLFor('user_api.diallistresource'),
+         "messages": URLFor('user_api.messagelistresource')
         }
     )
 
@@ -279,11 +533,11 @@ class UserSchema(ma.Schema):
 
 class AdminUserSchema(UserSchema):
     # url = ma.URLFor('user_api.adminuserresource', user_id='<id>', _external=True)
-    _links = ma.Hyperlinks(
-        {"self": ma.URLFor('user_api.adminuserresource', user_id="<id>"),
+    _links = Hyperlinks(
+        {"self": URLFor('user_api.adminuserresource', user_id="<id>"),
         #  "collection": ma.URLFor('user_api.userlistresource"),
-         "roles": ma.URLFor('user_api.adminrolelistresource', user_id="<id>"),
-         "messages": ma.URLFor('user_api.adminmessagelistresource', user_id='<id>')
+         "roles": URLFor('user_api.adminrolelistresource', user_id="<id>"),
+         "messages": URLFor('user_api.adminmessagelistresource', user_id='<id>')
         #  "notifications": ma.URLFor('user_api.adminnotiflistresource', user_id="<id>")
          }
     )
@@ -293,15 +547,29 @@ class MessageSchema(ma.Schema):
     text = fields.String(required=True)
     # url = ma.URLFor('user_api.notificationresource', notification_id='<id>')
 
+class MessageReadSchema(ma.Schema):
+    ids = fields.List(fields.Integer())
+    ranges = fields.List(fields.List(fields.Integer(), validate=validate.Length(equal=2)))
+    before = fields.Integer()
+
 class AdminMessageSchema(MessageSchema):
-    url = ma.URLFor('user_api.adminmessageresource', user_id='<user_id>', message_id='<id>')
+    url = URLFor('user_api.adminmessageresource', user_id='<user_id>', message_id='<id>')
+
+class BroadcastSchema(MessageSchema):
+    role_name = fields.String(validate=validate.OneOf([role.name.lower() for role in RolesEnum]))
+    user_type = fields.String(validate=validate.OneOf(choices=['student', 'officer']))
+
+    @validates_schema
+    def validate_target(self, data, **kwargs):
+        if ('role_name' in data) == ('user_type' in data):
+            raise ValidationError('exactly one of role_name or user_type is required')
 
 class GradeSchema(ma.Schema): 
     major = fields.String(required=True)
     college = fields.String(required=True)
     degree = fields.String(required=True, validate=validate.OneOf(choices=['diploma', 'bachelor', 'master', 'doctorate']))
     pic = fields.String()
-    url = ma.URLFor('user_api.graderesource', grade_id='<id>')
+    url = URLFor('user_api.graderesource', grade_id='<id>')
     class Meta:
         ordered = True
 
@@ -310,7 +578,7 @@ class DialSchema(ma.Schema):
     number = fields.String(required=True, validate=validate.Length(equal=11), allow_none=True)
     type = fields.String(required=True, validate=validate.OneOf(choices=['home', 'mobile', 'work']))
     # user = fields.Nested("UserSchema", only=['username'])
-    url = ma.URLFor('user_api.dialresource', dial_id='<id>')
+    url = URLFor('user_api.dialresource', dial_id='<id>')
     class Meta:
         ordered = True
 
@@ -332,15 +600,15 @@ class StudentSchema(UserDetailsSchema):
 class OfficerSchema(UserDetailsSchema):
     coop_start_date = fields.Date(required=True)
     work_experience = fields.Integer(required=True)
-    _links = ma.Hyperlinks(
-        {"expenses": ma.URLFor('expense_api.expenselistresource')}
+    _links = Hyperlinks(
+        {"expenses": URLFor('accounting_api.expenselistresource')}
     )
 
 class AdminStudentSchema(StudentSchema):
-    url = ma.URLFor('user_api.adminuserresource', user_id='<id>', _external=True)
+    url = URLFor('user_api.adminuserresource', user_id='<id>', _external=True)
 
 class AdminOfficerSchema(OfficerSchema):
-    url = ma.URLFor('user_api.adminuserresource', user_id='<id>', _external=True)
+    url = URLFor('user_api.adminuserresource', user_id='<id>', _external=True)
 
 class RoleSchema(ma.Schema):
     # id = fields.Integer(dump_only=True)
@@ -348,30 +616,102 @@ class RoleSchema(ma.Schema):
     
 class AdminRoleSchema(RoleSchema):
     # user = ma.URLFor('user_api.adminuserresource', user_id='<id>')
-    url = ma.URLFor('user_api.adminroleresource', user_id='<user_id>', role_id='<id>')
+    url = URLFor('user_api.adminroleresource', user_id='<user_id>', role_id='<id>')
+
+class ProfileSchema(UserSchema):
+    id = fields.Integer(dump_only=True)
+    authorized = fields.Boolean(dump_only=True)
+    unread_messages = fields.Integer(dump_only=True)
+    dials = fields.Nested(DialSchema, many=True, dump_only=True)
+    grades = fields.Nested(GradeSchema, many=True, dump_only=True)
+    roles = fields.Nested(RoleSchema, many=True, dump_only=True)
+
+class AdminProfileSchema(ProfileSchema):
+    roles = fields.Nested(AdminRoleSchema, many=True, dump_only=True)
+    _links = Hyperlinks(
+        {"self": URLFor('user_api.adminuserresource', user_id="<id>"),
+         "roles": URLFor('user_api.adminrolelistresource', user_id="<id>"),
+         "messages": URLFor('user_api.adminmessagelistresource', user_id='<id>')
+         }
+    )
 
 class TypeSchema(ma.Schema):
     type = fields.String(validate=validate.OneOf(choices=['officer', 'student']))
 
+class UserSearchSchema(ma.Schema):
+    q = fields.String(required=True, validate=validate.Length(min=2, max=50))
+    by = fields.String(validate=validate.OneOf(choices=['name', 'nat_id', 'username', 'email']))
+
+    class Meta:
+        # page and fields arguments share the query string
+        unknown = EXCLUDE
+
 class Friend(db.Model, AddUpdateDelete):
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id')) # user who has friends
-    friend_id = db.Column(db.Integer, db.ForeignKey('user.id')) # friend of user_id
-    user = db.relationship('User', backref='friends', foreign_keys=[user_id, friend_id])
+    # every friendship is stored in both directions, so a user's friends are
+    # always the rows with their user_id, read straight off the primary key
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE')) # user who has friends
+    friend_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE')) # friend of user_id
+    user = db.relationship('User', backref=db.backref('friends', passive_deletes=True), foreign_keys=[user_id])
     
     __table_args__ = (
-        db.ForeignKeyConstraint(["user_id", "friend_id"], ["user.id", "user.id"]),
         db.PrimaryKeyConstraint("user_id", "friend_id"),
+        db.Index('ix_friend_friend_id_user_id', 'friend_id', 'user_id'),
     )
     
     @classmethod
     def is_unique(cls, user_id, friend_id):
-        if Friend.query.filter_by(user_id=user_id, friend_id=friend_id).first() or Friend.query.filter_by(user_id=friend_id, friend_id=user_id).first():
-            return False
-        return True
+        # the reverse row exists whenever this one does
+        return cls.query.get((user_id, friend_id)) is None
 
     def __init__(self, user_id, friend_id):
         self.user_id = user_id
         self.friend_id = friend_id
 
+    @classmethod
+    def befriend(cls, user_id, friend_id):
+        """store both directions in one transaction, return the user_id side"""
+        friend = cls(user_id=user_id, friend_id=friend_id)
+        db.session.add_all([friend, cls(user_id=friend_id, friend_id=user_id)])
+        commit()
+        return friend
+
+    @classmethod
+    def unfriend(cls, user_id, friend_id):
+        deleted = cls.query.filter(db.or_(
+            db.and_(cls.user_id == user_id, cls.friend_id == friend_id),
+            db.and_(cls.user_id == friend_id, cls.friend_id == user_id))).delete(synchronize_session=False)
+        commit()
+        return deleted
+
+    @classmethod
+    def friend_ids(cls, user_id):
+        return db.session.query(cls.friend_id).filter(cls.user_id == user_id)
+
+    @classmethod
+    def mutual_query(cls, user_id, other_id):
+        """user_id's friendships with people who are friends of other_id too"""
+        return cls.query.filter(cls.user_id == user_id, cls.friend_id.in_(cls.friend_ids(other_id))).order_by(
+            cls.friend_id)
+
+    @classmethod
+    def second_degree(cls, user_id):
+        """(friend of a friend, mutual friends) pairs of people user_id is not friends with yet"""
+        first, second = aliased(cls), aliased(cls)
+        return db.session.query(second.friend_id.label('user_id'), db.func.count().label('mutual')).join(
+            first, second.user_id == first.friend_id).filter(
+            first.user_id == user_id,
+            second.friend_id != user_id,
+            ~second.friend_id.in_(cls.friend_ids(user_id))).group_by(second.friend_id)
+
+    @classmethod
+    def suggestions(cls, user_id, limit):
+        return cls.second_degree(user_id).order_by(db.desc('mutual'), db.asc('user_id')).limit(limit).all()
+
+    @classmethod
+    def degrees(cls, user_id):
+        first = cls.friend_ids(user_id).count()
+        second = cls.second_degree(user_id).count()
+        return first, second
+
 class FriendSchema(ma.Schema):
     friend_id = fields.Integer(required=True)
@@ -0,0 +1,62 @@
+import re
+
+from sqlalchemy import event
+
+# Arabic code points typed by Arabic keyboards are folded onto their Persian forms,
+# ZWNJ becomes a plain space and every digit script becomes ASCII
+CHARACTER_MAP = {
+    'ي': 'ی',  # ARABIC LETTER YEH -> FARSI YEH
+    'ى': 'ی',  # ARABIC LETTER ALEF MAKSURA -> FARSI YEH
+    'ك': 'ک',  # ARABIC LETTER KAF -> KEHEH
+    'ة': 'ه',  # ARABIC LETTER TEH MARBUTA -> HEH
+    '‌': ' ',       # ZERO WIDTH NON-JOINER
+    '‍': None,      # ZERO WIDTH JOINER
+    'ـ': None,      # TATWEEL
+}
+CHARACTER_MAP.update({chr(0x064b + offset): None for offset in range(8)})  # harakat
+CHARACTER_MAP.update({chr(0x0660 + digit): str(digit) for digit in range(10)})  # Arabic-Indic digits
+CHARACTER_MAP.update({chr(0x06f0 + digit): str(digit) for digit in range(10)})  # Persian digits
+CHARACTER_TABLE = str.maketrans(CHARACTER_MAP)
+
+WHITESPACE = re.compile(r'\s+')
+
+# model -> {source attribute: shadow attribute}
+normalized_columns = {}
+
+
+def normalize_text(value):
+    if value is None:
+        return None
+    return WHITESPACE.sub(' ', value.translate(CHARACTER_TABLE)).strip().lower()
+
+
+def escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def normalized_startswith(column, term):
+    """LIKE condition matching shadow column values that start with term
+
+    Only a prefix pattern can be answered from the column's index (a range scan on MySQL),
+    '%term%' would read every row.
+    """
+    return column.like(escape_like(normalize_text(term)) + '%', escape='\\')
+
+
+def normalize_row(model, row):
+    """fill the shadow columns of a dict headed for a core insert"""
+    for source, shadow in normalized_columns[model].items():
+        row[shadow] = normalize_text(row.get(source))
+    return row
+
+
+def add_normalized_columns(model, columns):
+    """keep the shadow columns of model in sync with their sources on every flush"""
+    normalized_columns[model] = columns
+
+    def populate(mapper, connection, target):
+        for source, shadow in columns.items():
+            setattr(target, shadow, normalize_text(getattr(target, source)))
+
+    event.listen(model, 'before_insert', populate, propagate=True)
+    event.listen(model, 'before_update', populate, propagate=True)
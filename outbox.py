@@ -0,0 +1,124 @@
+from threading import Event, Lock, Thread
+
+from helpers import execute_insert
+from models.UserModel import Message, MessageOutbox, User, UserRoles, db, on_commit, unread_counter_update
+from streams import message_hub
+
+# set whenever an entry is queued so the worker does not wait for its next poll
+outbox_ready = Event()
+
+
+def enqueue_message(subject, text, user_id=None, role_name=None, user_type=None):
+    entry = MessageOutbox(subject=subject, text=text, user_id=user_id, role_name=role_name, user_type=user_type)
+    entry.add(entry)
+    on_commit(outbox_ready.set)
+    return entry
+
+
+def get_recipients(entry):
+    """(user id column, condition) selecting the recipients of a group entry"""
+    if entry.role_name is not None:
+        return UserRoles.user_id, UserRoles.role_name == entry.role_name
+    if entry.user_type is not None:
+        return User.id, User.type == entry.user_type
+    return None
+
+
+def count_recipients(entry):
+    recipients = get_recipients(entry)
+    if recipients is None:
+        return 1
+    user_id, condition = recipients
+    return db.session.query(db.func.count(user_id)).filter(condition).scalar()
+
+
+def deliver(entry):
+    """insert the Message rows of an outbox entry with a single statement"""
+    recipients = get_recipients(entry)
+    if recipients is not None:
+        user_id, condition = recipients
+        rows = db.session.query(
+            db.literal(entry.subject), db.literal(entry.text), user_id, db.literal(False)
+        ).filter(condition)
+        statement = Message.__table__.insert().from_select(
+            ['subject', 'text', 'user_id', 'read'], rows.statement)
+        if entry.user_type is not None:
+            counter = unread_counter_update(1, User.__table__.c.type == entry.user_type)
+        else:
+            recipient_ids = db.session.query(user_id).filter(condition)
+            counter = unread_counter_update(1, User.__table__.c.id.in_(recipient_ids.subquery()))
+    else:
+        statement = Message.__table__.insert().values(
+            subject=entry.subject, text=entry.text, user_id=entry.user_id, read=False)
+        counter = unread_counter_update(1, User.__table__.c.id == entry.user_id)
+    execute_insert(db.session, statement)
+    db.session.execute(counter)
+
+
+def process_outbox(batch_size=100):
+    """deliver pending entries, return how many this call handled"""
+    entries = MessageOutbox.query.filter_by(processed=False).order_by(MessageOutbox.id).limit(batch_size).all()
+    recipients = []
+    for entry in entries:
+        # claiming with an UPDATE keeps concurrent workers from delivering an entry twice
+        claimed = MessageOutbox.query.filter_by(id=entry.id, processed=False).update(
+            {MessageOutbox.processed: True}, synchronize_session=False)
+        if claimed:
+            deliver(entry)
+            recipients.append(entry.user_id)
+    db.session.commit()
+    for user_id in recipients:
+        if user_id is None:
+            message_hub.publish_all()
+        else:
+            message_hub.publish(user_id)
+    return len(recipients)
+
+
+def prune_outbox(keep):
+    """delete delivered entries older than the newest keep of them, return how many"""
+    # the newest entry to delete, looked up first since MySQL cannot DELETE from a table it selects in a subquery
+    newest = db.session.query(MessageOutbox.id).filter_by(processed=True).order_by(
+        MessageOutbox.id.desc()).offset(keep).limit(1).scalar()
+    if newest is None:
+        return 0
+    deleted = MessageOutbox.query.filter(MessageOutbox.processed == True, MessageOutbox.id <= newest).delete(
+        synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def run_outbox_worker(app):
+    while True:
+        outbox_ready.wait(app.config['OUTBOX_POLL_INTERVAL'])
+        outbox_ready.clear()
+        with app.app_context():
+            try:
+                while process_outbox(app.config['OUTBOX_BATCH_SIZE']):
+                    pass
+                prune_outbox(app.config['OUTBOX_KEEP_PROCESSED'])
+            except Exception:
+                db.session.rollback()
+                app.logger.exception('outbox delivery failed')
+            finally:
+                db.session.remove()
+
+
+def start_outbox_worker(app):
+    worker = Thread(target=run_outbox_worker, args=(app,), name='outbox-worker', daemon=True)
+    worker.start()
+    return worker
+
+
+def init_outbox_worker(app):
+    """start the worker with the first request, so manage.py commands never poll the outbox"""
+    started = []
+    lock = Lock()
+
+    @app.before_request
+    def start_outbox_worker_once():
+        if started:
+            return
+        with lock:
+            if not started:
+                started.append(start_outbox_worker(app))
@@ -0,0 +1,48 @@
+from threading import Thread
+
+from models.UserModel import Message, User, db
+
+# parent model -> (child model, foreign key column) pairs too large for one ON DELETE CASCADE
+# statement, deleted in chunks first so no single transaction holds every row lock
+PURGE_PLANS = {
+    User: [(Message, Message.user_id)],
+}
+
+
+def delete_in_chunks(model, condition, chunk_size):
+    """delete the rows matching condition chunk_size at a time, one transaction each"""
+    primary_key = db.inspect(model).primary_key[0]
+    deleted = 0
+    while True:
+        ids = [row[0] for row in db.session.query(primary_key).filter(condition).limit(chunk_size)]
+        if not ids:
+            return deleted
+        deleted += model.query.filter(primary_key.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def purge(model, ident, chunk_size):
+    """delete a parent with its large children in chunks, the rest by ON DELETE CASCADE"""
+    for child, column in PURGE_PLANS.get(model, []):
+        delete_in_chunks(child, column == ident, chunk_size)
+    primary_key = db.inspect(model).primary_key[0]
+    model.query.filter(primary_key == ident).delete(synchronize_session=False)
+    db.session.commit()
+
+
+def run_purge(app, model, ident):
+    with app.app_context():
+        try:
+            purge(model, ident, app.config['PURGE_CHUNK_SIZE'])
+        except Exception:
+            db.session.rollback()
+            app.logger.exception('purge of %s %s failed', model.__tablename__, ident)
+        finally:
+            db.session.remove()
+
+
+def start_purge(app, model, ident):
+    worker = Thread(target=run_purge, args=(app, model, ident),
+                    name='purge-{}-{}'.format(model.__tablename__, ident), daemon=True)
+    worker.start()
+    return worker
@@ -0,0 +1,100 @@
+import re
+
+from sqlalchemy import event
+
+from models.UserModel import db
+
+# url rule converters, every id is filled with 1
+URL_ARGUMENT = re.compile(r'<[^>]+>')
+# routes that hold the request open instead of answering
+LONG_POLL_SUFFIXES = ('/stream',)
+# query strings a route is also checked with, for the filters it only applies when asked
+QUERY_STRINGS = {
+    '/api/users/search': ['q=seed&by=username', 'q=seed&by=email', 'q=12&by=nat_id'],
+    '/api/category/1/documents': ['q=سند'],
+    '/api/courses': ['q=درس'],
+    '/api/heyats': ['q=مراسم'],
+}
+# names are searched anywhere in them, which only MySQL's FULLTEXT index answers
+DIALECT_QUERY_STRINGS = {
+    'mysql': {'/api/users/search': ['q=seed', 'q=محمد&by=name']},
+}
+
+
+def route_urls(app, prefix='/api/', dialect_name=None):
+    """one url per GET route under prefix, and one per query string the route is checked with"""
+    query_strings = DIALECT_QUERY_STRINGS.get(dialect_name, {})
+    urls = set()
+    for rule in app.url_map.iter_rules():
+        if 'GET' in rule.methods and rule.rule.startswith(prefix) and not rule.rule.endswith(LONG_POLL_SUFFIXES):
+            url = URL_ARGUMENT.sub('1', rule.rule)
+            urls.add(url)
+            for query_string in QUERY_STRINGS.get(url, []) + query_strings.get(url, []):
+                urls.add('{}?{}'.format(url, query_string))
+    return sorted(urls)
+
+
+def capture_statements(client, url, headers):
+    """(statement, parameters) of every SELECT a GET of url runs"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+
+    engine = db.get_engine()
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        response = client.get(url, headers=headers)
+        # streamed exports keep querying while their body is read
+        response.get_data()
+        response.close()
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+    return statements
+
+
+def explain(statement, parameters):
+    """EXPLAIN rows of statement as dicts, run on its own DBAPI connection"""
+    engine = db.get_engine()
+    prefix = 'EXPLAIN QUERY PLAN ' if engine.dialect.name == 'sqlite' else 'EXPLAIN '
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(prefix + statement, parameters)
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
+    finally:
+        connection.close()
+
+
+def is_table(name):
+    """whether a plan names a real table, or an alias of one, rather than a subquery"""
+    tables = db.metadata.tables
+    return name in tables or re.sub(r'_\d+$', '', name) in tables
+
+
+def full_scans(rows, dialect_name):
+    """the plan rows reading a whole table or a whole index"""
+    if dialect_name == 'sqlite':
+        # "SCAN user", "SCAN TABLE user" before 3.36, and "SCAN user USING COVERING INDEX ..." for index scans
+        scans = [(row, re.match(r'SCAN (?:TABLE )?(\w+)', row['detail'])) for row in rows]
+        return [row for row, match in scans if match and is_table(match.group(1))]
+    # ALL reads every row, index reads every entry of an index
+    return [row for row in rows if row['type'] in ('ALL', 'index') and row['table'] and is_table(row['table'])]
+
+
+def check_query_plans(app, client, headers):
+    """(url, statement, offending plan rows) for every filtered SELECT the API runs that scans a table"""
+    failures = []
+    with app.app_context():
+        dialect_name = db.get_engine().dialect.name
+        for url in route_urls(app, dialect_name=dialect_name):
+            for statement, parameters in capture_statements(client, url, headers):
+                # unfiltered lists read the whole table on purpose
+                if not re.search(r'\bWHERE\b', statement):
+                    continue
+                scans = full_scans(explain(statement, parameters), dialect_name)
+                if scans:
+                    failures.append((url, statement, scans))
+    return failures
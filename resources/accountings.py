@@ -10,8 +10,8 @@ from flask import g
 from models.UserModel import db
 from models.AccountingModel import Expense, ExpenseSchema
 
-from helpers import PaginationHelper
-from auth import ExpenseAuthRequiredResource, basic_auth, roles_required, token_auth
+from helpers import PaginationHelper, add_export_resource, conditional_dump
+from auth import AccountingAuthRequiredResource, basic_auth, roles_required, token_auth
 
 
 accounting_api_bp = Blueprint('accounting_api', __name__)
@@ -19,7 +19,7 @@ accounting_api = Api(accounting_api_bp)
 
 expense_schema = ExpenseSchema()
 
-class ExpenseListResource(ExpenseAuthRequiredResource):
+class ExpenseListResource(AccountingAuthRequiredResource):
     def get(self):
         pagination_helper = PaginationHelper(
             request,
@@ -50,11 +50,10 @@ class ExpenseListResource(ExpenseAuthRequiredResource):
             resp = {"error": str(e)}
             return resp, status.HTTP_400_BAD_REQUEST
 
-class ExpenseResource(ExpenseAuthRequiredResource):
+class ExpenseResource(AccountingAuthRequiredResource):
     def get(self, expense_id):
         expense = Expense.query.get_or_404(expense_id)
-        result = expense_schema.dump(expense)
-        return result
+        return conditional_dump(request, expense, expense_schema)
 
     def patch(self, expense_id):
         expense = Expense.query.get_or_404(expense_id)
@@ -97,4 +96,5 @@ class ExpenseResource(ExpenseAuthRequiredResource):
 
 
 accounting_api.add_resource(ExpenseListResource, '/expenses')
+add_export_resource(accounting_api, ExpenseListResource, '/expenses')
 accounting_api.add_resource(ExpenseResource, '/expenses/<int:expense_id>')
\ No newline at end of file
@@ -11,7 +11,7 @@ from models.UserModel import db, Message, User
 from models.CampModel import Camp, UserPayments
 from models.CampModel import CampSchema, UserPaymentSchema
 
-from helpers import PaginationHelper
+from helpers import PaginationHelper, add_export_resource, conditional_dump
 from auth import CampAuthRequiredResource, basic_auth, roles_required, token_auth
 
 
@@ -59,8 +59,7 @@ class CampListResource(CampAuthRequiredResource):
 class CampResource(CampAuthRequiredResource):
     def get(self, camp_id):
         camp = Camp.query.get_or_404(camp_id)
-        result = camp_schema.dump(camp)
-        return result
+        return conditional_dump(request, camp, camp_schema)
 
     def patch(self, camp_id):
         camp = Camp.query.get_or_404(camp_id)
@@ -136,7 +135,7 @@ class UserPaymentsListResource(CampAuthRequiredResource):
     
 class UserPaymentsResource(CampAuthRequiredResource):
     def get(self, user_id, camp_id):
-        user_payments = UserPayments.query.filiter_by(camp_id=camp_id, user_id=user_id).first()
+        user_payments = UserPayments.query.filter_by(camp_id=camp_id, user_id=user_id).first()
         result = user_payments_schema.dump(user_payments)
         return result
 
@@ -170,7 +169,9 @@ class UserPaymentsResource(CampAuthRequiredResource):
 
 
 camp_api.add_resource(CampListResource, '/camps')
+add_export_resource(camp_api, CampListResource, '/camps')
 camp_api.add_resource(CampResource, '/camps/<int:camp_id>')
 
 camp_api.add_resource(UserPaymentsListResource, '/camps/<int:camp_id>/users')
+add_export_resource(camp_api, UserPaymentsListResource, '/camps/<int:camp_id>/users')
 camp_api.add_resource(UserPaymentsResource, '/camps/<int:camp_id>/users/<int:user_id>')
\ No newline at end of file
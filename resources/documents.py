@@ -7,7 +7,8 @@ from marshmallow.exceptions import ValidationError
 import status
 from auth import (DocumentAuthRequiredResource, basic_auth,
                   roles_required, token_auth)
-from helpers import PaginationHelper
+from helpers import PaginationHelper, add_export_resource
+from normalization import normalized_startswith
 from models.UserModel import db
 from models.DocumentModel import Document, Voice, Book, Booklet, Category
 from models.DocumentModel import DocumentSchema, VoiceSchema, BookSchema, BookletSchema, TypeSchema, CategorySchema
@@ -99,6 +100,8 @@ class DocumentListResource(DocumentAuthRequiredResource):
         else:
             query = Document.query.filter_by(category_id=category_id)
             schema = document_schema
+        if 'q' in request_params:
+            query = query.filter(normalized_startswith(Document.topic_normalized, request_params['q']))
         pagination_helper = PaginationHelper(
             request,
             query=query,
@@ -234,7 +237,9 @@ class DocumentResource(DocumentAuthRequiredResource):
 
 
 document_api.add_resource(CategoryListResource, '/category')
+add_export_resource(document_api, CategoryListResource, '/category')
 document_api.add_resource(CategoryResource, '/category/<int:category_id>')
 
 document_api.add_resource(DocumentListResource, '/category/<int:category_id>/documents')
+add_export_resource(document_api, DocumentListResource, '/category/<int:category_id>/documents')
 document_api.add_resource(DocumentResource, '/category/<int:category_id>/documents/<int:document_id>')
\ No newline at end of file
@@ -7,7 +7,8 @@ from marshmallow.exceptions import ValidationError
 import status
 from auth import (EducationAuthRequiredResource, basic_auth,
                   roles_required, token_auth)
-from helpers import PaginationHelper
+from helpers import IncludeTree, PaginationHelper, add_export_resource, conditional_dump
+from normalization import normalized_startswith
 from models.EduModel import (Course, CourseSchema, Exam, ExamResult,
                              ExamResultSchema, ExamSchema, Lecture,
                              LectureSchema, LectureSession,
@@ -28,12 +29,23 @@ lecture_user_session_schema = LectureUserSessionSchema()
 exam_schema = ExamSchema()
 exam_result_schema = ExamResultSchema()
 
+lecture_includes = IncludeTree(Lecture, LectureSchema, {
+    'sessions': LectureSessionSchema,
+    'sessions.users': LectureUserSessionSchema,
+    'users': LectureUserSchema,
+    'exams': ExamSchema,
+    'exams.results': ExamResultSchema,
+})
+
 
 class CourseListResource(EducationAuthRequiredResource):
     def get(self):
+        query = Course.query
+        if 'q' in request.args:
+            query = query.filter(normalized_startswith(Course.name_normalized, request.args['q']))
         pagination_helper = PaginationHelper(
             request,
-            query=Course.query,
+            query=query,
             resource_for_url='education_api.courselistresource',
             key_name='results',
             schema=course_schema)
@@ -62,8 +74,7 @@ class CourseListResource(EducationAuthRequiredResource):
 class CourseResource(EducationAuthRequiredResource):
     def get(self, course_id):
         course = Course.query.get_or_404(course_id)
-        result = course_schema.dump(course)
-        return result
+        return conditional_dump(request, course, course_schema)
 
     def patch(self, course_id):
         course = Course.query.get_or_404(course_id)
@@ -108,7 +119,8 @@ class LectureListResource(EducationAuthRequiredResource):
             query=Lecture.query.filter_by(course_id=course_id),
             resource_for_url='education_api.lecturelistresource',
             key_name='results',
-            schema=lecture_schema)
+            schema=lecture_schema,
+            include=lecture_includes)
         result = pagination_helper.paginate_query()
         return result
 
@@ -137,9 +149,9 @@ class LectureListResource(EducationAuthRequiredResource):
 
 class LectureResource(EducationAuthRequiredResource):
     def get(self, lecture_id, course_id):
-        lecture = Lecture.query.get_or_404(lecture_id)
-        result = lecture_schema.dump(lecture)
-        return result
+        include = lecture_includes.parse(request)
+        lecture = Lecture.query.options(*lecture_includes.options(include)).get_or_404(lecture_id)
+        return lecture_includes.dump(request, lecture, lecture_schema, include)
 
     def patch(self, lecture_id, course_id):
         lecture = Lecture.query.get_or_404(lecture_id)
@@ -218,8 +230,7 @@ class LectureSessionListResource(EducationAuthRequiredResource):
 class LectureSessionResource(EducationAuthRequiredResource):
     def get(self, course_id, lecture_id, session_id):
         lecture_session = LectureSession.query.get_or_404(session_id)
-        result = lecture_session_schema.dump(lecture_session)
-        return result
+        return conditional_dump(request, lecture_session, lecture_session_schema)
 
     def patch(self, course_id, lecture_id, session_id):
         lecture_session = LectureSession.query.get_or_404(session_id)
@@ -395,8 +406,7 @@ class ExamListResource(EducationAuthRequiredResource):
 class ExamResource(EducationAuthRequiredResource):
     def get(self, course_id, lecture_id, exam_id):
         exam = Exam.query.get_or_404(exam_id)
-        result = exam_schema.dump(exam)
-        return result
+        return conditional_dump(request, exam, exam_schema)
 
     def patch(self, course_id, lecture_id, exam_id):
         exam = Exam.query.get_or_404(exam_id)
@@ -466,12 +476,12 @@ class ExamResultListResource(EducationAuthRequiredResource):
             return resp, status.HTTP_400_BAD_REQUEST
 
 class ExamResultResource(EducationAuthRequiredResource):
-    def get(self, course_id, exam_id, user_id):
+    def get(self, course_id, lecture_id, exam_id, user_id):
         exam_result = ExamResult.query.filter_by(exam_id=exam_id, student_id=user_id).first()
         result = exam_result_schema.dump(exam_result)
         return result
 
-    def patch(self, course_id, exam_id, user_id):
+    def patch(self, course_id, lecture_id, exam_id, user_id):
         exam_result = ExamResult.query.filter_by(exam_id=exam_id, student_id=user_id).first()
         exam_dict = request.get_json(force=True)
         if 'datetime' in exam_dict:
@@ -486,13 +496,13 @@ class ExamResultResource(EducationAuthRequiredResource):
             return e.args[0], status.HTTP_400_BAD_REQUEST
         try:
             exam_result.update()
-            return self.get(course_id, exam_id, user_id)
+            return self.get(course_id, lecture_id, exam_id, user_id)
         except SQLAlchemyError as e:
             db.session.rollback()
             resp = {"error": str(e)}
             return resp, status.HTTP_400_BAD_REQUEST
 
-    def delete(self, course_id, exam_id, user_id):
+    def delete(self, course_id, lecture_id, exam_id, user_id):
         exam_result = ExamResult.query.filter_by(exam_id=exam_id, student_id=user_id).first()
         try:
             exam_result.delete(exam_result)
@@ -505,22 +515,28 @@ class ExamResultResource(EducationAuthRequiredResource):
 
 
 education_api.add_resource(CourseListResource, '/courses')
+add_export_resource(education_api, CourseListResource, '/courses')
 education_api.add_resource(CourseResource, '/courses/<int:course_id>')
 
 education_api.add_resource(LectureListResource, '/courses/<int:course_id>/lectures')
+add_export_resource(education_api, LectureListResource, '/courses/<int:course_id>/lectures')
 education_api.add_resource(LectureResource, '/courses/<int:course_id>/lectures/<int:lecture_id>')
 
 education_api.add_resource(LectureUserListResource, ('/courses/<int:course_id>/lectures/<int:lecture_id>/users'))
+add_export_resource(education_api, LectureUserListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/users')
 education_api.add_resource(LectureUserResource, ('/courses/<int:course_id>/lectures/<int:lecture_id>/users/<int:user_id>'))
 
 education_api.add_resource(LectureSessionListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/sessions')
+add_export_resource(education_api, LectureSessionListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/sessions')
 education_api.add_resource(LectureSessionResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/sessions/<int:session_id>')
 
 education_api.add_resource(LectureUserSessionListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/sessions/<int:session_id>/users')
 education_api.add_resource(LectureUserSessionResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/sessions/<int:session_id>/users/<int:user_id>')
 
 education_api.add_resource(ExamListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/exams')
+add_export_resource(education_api, ExamListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/exams')
 education_api.add_resource(ExamResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/exams/<int:exam_id>')
 
 education_api.add_resource(ExamResultListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/exams/<int:exam_id>/users')
+add_export_resource(education_api, ExamResultListResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/exams/<int:exam_id>/users')
 education_api.add_resource(ExamResultResource, '/courses/<int:course_id>/lectures/<int:lecture_id>/exams/<int:exam_id>/users/<int:user_id>')
@@ -10,7 +10,7 @@ from flask import g
 from models.UserModel import db
 from models.FormModel import Form, FormSchema
 
-from helpers import PaginationHelper
+from helpers import PaginationHelper, add_export_resource, conditional_dump
 from auth import FormAuthRequiredResource, basic_auth, roles_required, token_auth
 
 
@@ -49,8 +49,7 @@ class FormListResource(FormAuthRequiredResource):
 class FormResource(FormAuthRequiredResource):
     def get(self, form_id):
         form = Form.query.get_or_404(form_id)
-        result = form_schema.dump(form)
-        return result
+        return conditional_dump(request, form, form_schema)
 
     def patch(self, form_id):
         form = Form.query.get_or_404(form_id)
@@ -86,4 +85,5 @@ class FormResource(FormAuthRequiredResource):
 
 
 form_api.add_resource(FormListResource, '/forms')
+add_export_resource(form_api, FormListResource, '/forms')
 form_api.add_resource(FormResource, '/forms/<int:form_id>')
\ No newline at end of file
@@ -7,7 +7,8 @@ from marshmallow.exceptions import ValidationError
 import status
 from auth import (HeyatAuthRequiredResource, basic_auth,
                   roles_required, token_auth)
-from helpers import PaginationHelper
+from helpers import PaginationHelper, add_export_resource, conditional_dump
+from normalization import normalized_startswith
 from models.HeyatModel import Heyat, HeyatSchema, HeyatUsers, HeyatUsersSchema
 from models.UserModel import Message, User, db
 
@@ -22,9 +23,12 @@ heyat_users_schema = HeyatUsersSchema()
 
 class HeyatListResource(HeyatAuthRequiredResource):
     def get(self):
+        query = Heyat.query
+        if 'q' in request.args:
+            query = query.filter(normalized_startswith(Heyat.reason_normalized, request.args['q']))
         pagination_helper = PaginationHelper(
             request,
-            query=Heyat.query,
+            query=query,
             resource_for_url='heyat_api.heyatlistresource',
             key_name='results',
             schema=heyat_schema)
@@ -62,8 +66,7 @@ class HeyatListResource(HeyatAuthRequiredResource):
 class HeyatResource(HeyatAuthRequiredResource):
     def get(self, heyat_id):
         heyat = Heyat.query.get_or_404(heyat_id)
-        result = heyat_schema.dump(heyat)
-        return result
+        return conditional_dump(request, heyat, heyat_schema)
 
     def patch(self, heyat_id):
         heyat = Heyat.query.get_or_404(heyat_id)
@@ -146,7 +149,7 @@ class HeyatUsersListResource(HeyatAuthRequiredResource):
     
 class HeyatUsersResource(HeyatAuthRequiredResource):
     def get(self, user_id, heyat_id):
-        heyat_users = HeyatUsers.query.filiter_by(heyat_id=heyat_id, user_id=user_id).first()
+        heyat_users = HeyatUsers.query.filter_by(heyat_id=heyat_id, user_id=user_id).first()
         result = heyat_users_schema.dump(heyat_users)
         return result
 
@@ -184,7 +187,9 @@ class HeyatUsersResource(HeyatAuthRequiredResource):
 
 
 heyat_api.add_resource(HeyatListResource, '/heyats')
+add_export_resource(heyat_api, HeyatListResource, '/heyats')
 heyat_api.add_resource(HeyatResource, '/heyats/<int:heyat_id>')
 
 heyat_api.add_resource(HeyatUsersListResource, '/heyats/<int:heyat_id>/users')
+add_export_resource(heyat_api, HeyatUsersListResource, '/heyats/<int:heyat_id>/users')
 heyat_api.add_resource(HeyatUsersResource, '/heyats/<int:heyat_id>/users/<int:user_id>')
@@ -7,7 +7,7 @@ from marshmallow.exceptions import ValidationError
 import status
 from auth import (AuthRequiredResource, basic_auth,
                   role_authenticated, get_current_user_role, token_auth)
-from helpers import PaginationHelper
+from helpers import PaginationHelper, add_export_resource
 from models.ReportModel import (CampReport, HeyatReport, LectureReport,
                                 Multimedia, MultimediaSchema, Report,
                                 ReportSchema, ReportArgsSchema)
@@ -204,4 +204,5 @@ class MultimediaResource(AuthRequiredResource):
 report_api.add_resource(ReportListResource, '/report')
 report_api.add_resource(ReportResource, '/report/<int:report_id>')
 report_api.add_resource(MultimediaListResource, '/report/<int:report_id>/multimedias')
+add_export_resource(report_api, MultimediaListResource, '/report/<int:report_id>/multimedias')
 report_api.add_resource(MultimediaResource, '/report/<int:report_id>/multimedias/<int:multimedia_id>')
\ No newline at end of file
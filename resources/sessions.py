@@ -7,12 +7,13 @@ from marshmallow.exceptions import ValidationError
 import status
 from auth import (SessionAuthRequiredResource, basic_auth,
                   roles_required, token_auth)
-from helpers import PaginationHelper
+from helpers import IncludeTree, PaginationHelper, add_export_resource, conditional_dump
 from models.SessionModel import (Deadline, DeadlineSchema, Session,
                                  SessionDetails, SessionDetailsSchema,
                                  SessionSchema, SessionUser, SessionUserSchema,
                                  Task, TaskSchema)
 from models.UserModel import Message, User, db
+from outbox import enqueue_message
 
 session_api_bp = Blueprint('session_api', __name__)
 
@@ -25,6 +26,13 @@ session_user_schema = SessionUserSchema()
 task_schema = TaskSchema()
 deadline_schema = DeadlineSchema()
 
+session_includes = IncludeTree(Session, SessionSchema, {
+    'details': SessionDetailsSchema,
+    'users': SessionUserSchema,
+    'users.tasks': TaskSchema,
+    'users.tasks.deadlines': DeadlineSchema,
+})
+
 
 class SessionListResource(SessionAuthRequiredResource):
     def get(self):
@@ -33,7 +41,8 @@ class SessionListResource(SessionAuthRequiredResource):
             query=Session.query,
             resource_for_url='session_api.sessionlistresource',
             key_name='results',
-            schema=session_schema)
+            schema=session_schema,
+            include=session_includes)
         result = pagination_helper.paginate_query()
         return result
 
@@ -59,9 +68,9 @@ class SessionListResource(SessionAuthRequiredResource):
 
 class SessionResource(SessionAuthRequiredResource):
     def get(self, session_id):
-        session = Session.query.get_or_404(session_id)
-        result = session_schema.dump(session)
-        return result
+        include = session_includes.parse(request)
+        session = Session.query.options(*session_includes.options(include)).get_or_404(session_id)
+        return session_includes.dump(request, session, session_schema, include)
 
     def patch(self, session_id):
         session = Session.query.get_or_404(session_id)
@@ -180,8 +189,7 @@ class SessionUsersListResource(SessionAuthRequiredResource):
         try:
             session_user = SessionUser(user_id=user_id, session_id=session_id, present=present)
             session_user.add(session_user)
-            message = Message(subject='session invited: {}'.format(session_id), user_id=user_id, text=session.subject)
-            message.add(message)
+            enqueue_message(subject='session invited: {}'.format(session_id), user_id=user_id, text=session.subject)
             query = SessionUser.query.filter_by(user_id=user_id, session_id=session_id).first()
             result = session_user_schema.dump(query)
             return result, status.HTTP_201_CREATED
@@ -192,7 +200,7 @@ class SessionUsersListResource(SessionAuthRequiredResource):
 
 class SessionUsersResource(SessionAuthRequiredResource):
     def get(self, user_id, session_id):
-        session_user = SessionUser.query.filiter_by(session_id=session_id, user_id=user_id).first()
+        session_user = SessionUser.query.filter_by(session_id=session_id, user_id=user_id).first_or_404()
         result = session_user_schema.dump(session_user)
         return result
 
@@ -256,8 +264,7 @@ class TaskListResource(SessionAuthRequiredResource):
         try:
             task = Task(user_id=user_id, session_id=session_id, subject=request_dict['subject'], description=description, priority=priority)
             task.add(task)
-            message = Message(subject='your task: {}'.format(task.id), user_id=user_id, text=task.subject)
-            message.add(message)
+            enqueue_message(subject='your task: {}'.format(task.id), user_id=user_id, text=task.subject)
             query = Task.query.filter_by(user_id=user_id, session_id=session_id).first()
             result = task_schema.dump(query)
             return result, status.HTTP_201_CREATED
@@ -269,8 +276,7 @@ class TaskListResource(SessionAuthRequiredResource):
 class TaskResource(SessionAuthRequiredResource):
     def get(self, session_id, user_id, task_id):
         task = Task.query.get_or_404(task_id)
-        result = task_schema.dump(task)
-        return result
+        return conditional_dump(request, task, task_schema)
 
     def patch(self, user_id, session_id, task_id):
         task = Task.query.get_or_404(task_id)
@@ -332,8 +338,7 @@ class DeadlineListResource(SessionAuthRequiredResource):
 class DeadlineResource(SessionAuthRequiredResource):
     def get(self, session_id, user_id, task_id, deadline_id):
         deadline = Deadline.query.get_or_404(deadline_id)
-        result = deadline_schema.dump(deadline)
-        return result
+        return conditional_dump(request, deadline, deadline_schema)
 
     def patch(self, user_id, session_id, task_id, deadline_id):
         deadline = Deadline.query.get_or_404(deadline_id)
@@ -365,15 +370,19 @@ class DeadlineResource(SessionAuthRequiredResource):
 
 
 session_api.add_resource(SessionListResource, '/sessions')
+add_export_resource(session_api, SessionListResource, '/sessions')
 session_api.add_resource(SessionResource, '/sessions/<int:session_id>')
 
 session_api.add_resource(SessionDetailsResource, '/sessions/<int:session_id>/details')
 
 session_api.add_resource(SessionUsersListResource, '/sessions/<int:session_id>/users')
+add_export_resource(session_api, SessionUsersListResource, '/sessions/<int:session_id>/users')
 session_api.add_resource(SessionUsersResource, '/sessions/<int:session_id>/users/<int:user_id>')
 
 session_api.add_resource(TaskListResource, '/sessions/<int:session_id>/users/<int:user_id>/tasks')
+add_export_resource(session_api, TaskListResource, '/sessions/<int:session_id>/users/<int:user_id>/tasks')
 session_api.add_resource(TaskResource, '/sessions/<int:session_id>/users/<int:user_id>/tasks/<int:task_id>')
 
 session_api.add_resource(DeadlineListResource, '/sessions/<int:session_id>/users/<int:user_id>/tasks/<int:task_id>/deadlines')
+add_export_resource(session_api, DeadlineListResource, '/sessions/<int:session_id>/users/<int:user_id>/tasks/<int:task_id>/deadlines')
 session_api.add_resource(DeadlineResource, '/sessions/<int:session_id>/users/<int:user_id>/tasks/<int:task_id>/deadlines/<int:deadline_id>')
@@ -7,7 +7,7 @@ from marshmallow.exceptions import ValidationError
 import status
 from auth import (SportAuthRequiredResource, basic_auth,
                   roles_required, token_auth)
-from helpers import PaginationHelper
+from helpers import PaginationHelper, add_export_resource, conditional_dump
 from models.SportModel import Sport, SportSchema, SportUsers, SportUsersSchema
 from models.UserModel import Message, User, db
 
@@ -50,8 +50,7 @@ class SportListResource(SportAuthRequiredResource):
 class SportResource(SportAuthRequiredResource):
     def get(self, sport_id):
         sport = Sport.query.get_or_404(sport_id)
-        result = sport_schema.dump(sport)
-        return result
+        return conditional_dump(request, sport, sport_schema)
 
     def patch(self, sport_id):
         sport = Sport.query.get_or_404(sport_id)
@@ -125,7 +124,7 @@ class SportUsersListResource(SportAuthRequiredResource):
     
 class SportUsersResource(SportAuthRequiredResource):
     def get(self, user_id, sport_id):
-        sport_users = SportUsers.query.filiter_by(sport_id=sport_id, user_id=user_id).first()
+        sport_users = SportUsers.query.filter_by(sport_id=sport_id, user_id=user_id).first()
         result = sport_users_schema.dump(sport_users)
         return result
 
@@ -163,7 +162,9 @@ class SportUsersResource(SportAuthRequiredResource):
 
 
 sport_api.add_resource(SportListResource, '/sports')
+add_export_resource(sport_api, SportListResource, '/sports')
 sport_api.add_resource(SportResource, '/sports/<int:sport_id>')
 
 sport_api.add_resource(SportUsersListResource, '/sports/<int:sport_id>/users')
+add_export_resource(sport_api, SportUsersListResource, '/sports/<int:sport_id>/users')
 sport_api.add_resource(SportUsersResource, '/sports/<int:sport_id>/users/<int:user_id>')
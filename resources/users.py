@@ -1,4 +1,5 @@
-from flask import Blueprint, g, jsonify, make_response, request
+from flask import (Blueprint, Response, current_app, g, json, jsonify, make_response, request,
+                   stream_with_context)
 from flask_httpauth import HTTPBasicAuth
 from flask_restful import Api, Resource, abort
 from sqlalchemy.exc import SQLAlchemyError
@@ -7,18 +8,23 @@ from marshmallow.exceptions import ValidationError
 import status
 import datetime
 from auth import (AdminAuthRequiredResource, AuthRequiredResource, MentorAuthRequiredResource,
-                  basic_auth, roles_required, token_auth)
-from helpers import PaginationHelper
+                  basic_auth, invalidate_principal, roles_required, token_auth)
+from helpers import PaginationHelper, add_export_resource, compute_etag, conditional_dump, conditional_response
+from outbox import count_recipients, enqueue_message
+from purge import start_purge
+from streams import message_hub
+from user_import import import_users, read_rows, remove_existing, validate_rows
 from models.UserModel import (AdminMessageSchema, AdminRoleSchema,
                               AdminUserSchema, AdminStudentSchema, AdminOfficerSchema,
                               Dial, DialSchema, Grade,
-                              GradeSchema, Message, MessageSchema,
+                              GradeSchema, Message, MessageSchema, MessageReadSchema,
+                              MessageOutbox, BroadcastSchema,
                               Notification, NotificationSchema,
-                              OfficerSchema, RoleSchema,
+                              OfficerSchema, RoleSchema, ProfileSchema, AdminProfileSchema,
                               StudentSchema, User, UserDetails,
                               StudentDetails, OfficerDetails,
                               Friend, FriendSchema, UserDetailsSchema,
-                              UserRoles, UserSchema, TypeSchema, db, ma)
+                              UserRoles, UserSchema, UserSearchSchema, TypeSchema, db, ma, on_commit)
 
 user_api_bp = Blueprint('user_api', __name__)
 
@@ -27,17 +33,22 @@ officer_schema = OfficerSchema()
 user_schema = UserSchema()
 
 type_schema = TypeSchema()
+user_search_schema = UserSearchSchema()
 
 admin_user_schema = AdminUserSchema()
+profile_schema = ProfileSchema()
+admin_profile_schema = AdminProfileSchema()
 
 dial_schema = DialSchema()
 role_schema = RoleSchema()
 grade_schema = GradeSchema()
 message_schema = MessageSchema()
+message_read_schema = MessageReadSchema()
 notif_schema = NotificationSchema()
 # details_schema = UserDetailsSchema()
 
 admin_message_schema = AdminMessageSchema()
+broadcast_schema = BroadcastSchema()
 admin_role_schema = AdminRoleSchema()
 
 friend_schema = FriendSchema()
@@ -45,32 +56,40 @@ friend_schema = FriendSchema()
 user_api = Api(user_api_bp)
 
 
-def get_admins():
-    return UserRoles.query.filter_by(role_name='admin').all()
+def get_profile(user_id, schema):
+    user, details = User.load_profile(user_id)
+    if user is None:
+        abort(status.HTTP_404_NOT_FOUND)
+    objects = [user] + user.dials + user.grades + user.roles + ([details] if details else [])
+
+    def build_result():
+        result = schema.dump(user)
+        details_schema = student_schema if user.type == 'student' else officer_schema
+        result['details'] = details_schema.dump(details) if details else None
+        return result
+    return conditional_response(request, compute_etag(objects), build_result)
 
 
 class UserResource(AuthRequiredResource):
     def get(self):
         user = User.query.get_or_404(g.user.id)
-        result = user_schema.dump(user)
-        return result
+        return conditional_dump(request, user, user_schema)
 
     def patch(self):
         user = User.query.get_or_404(g.user.id)
         user_dict = request.get_json(force=True)
         if 'password' in user_dict:
             user.password = User.set_password(user_dict['password'])
+        existing_users = User.find_by_username_or_email(username=user_dict.get('username'), email=user_dict.get('email'))
         if 'email' in user_dict:
-            email = user_dict['email']
-            existing_email = User.query.filter_by(email=email).first()
-            if existing_email:
+            email = User.normalize_email(user_dict['email'])
+            if any(existing.email_normalized == email for existing in existing_users):
                 response = {'user': 'An user with the same email already exists'}
                 return response, status.HTTP_409_CONFLICT    
             user.email = user_dict['email']
         if 'username' in user_dict:
             username = user_dict['username']
-            existing_email = User.query.filter_by(username=username).first()
-            if existing_email:
+            if any(existing.username == username for existing in existing_users):
                 response = {'user': 'An user with the same username already exists'}
                 return response, status.HTTP_409_CONFLICT    
             user.username = user_dict['username']
@@ -123,9 +142,7 @@ class UserListResource(Resource):
         username = request_dict['username']
         password = request_dict['password']
         email = request_dict['email']
-        existing_username = User.query.filter_by(username=username).first()
-        existing_email = User.query.filter_by(email=email).first()
-        if existing_username or existing_email:
+        if User.find_by_username_or_email(username=username, email=email):
             response = {'user': 'An user with the same username or email already exists'}
             return response, status.HTTP_409_CONFLICT
         try:
@@ -133,19 +150,19 @@ class UserListResource(Resource):
             user.add(user)
             query = User.query.get(user.id)
             result = user_schema.dump(query)
-            for admin in get_admins():
-                message = Message(subject='new user created', text='accept or reject it. user_id={}'.format(user.id), user_id=admin.user_id)
-                message.add(message)
+            enqueue_message(subject='new user created', text='accept or reject it. user_id={}'.format(user.id), role_name='admin')
             if type == 'officer':
-                for admin in get_admins():
-                    message = Message(subject='new officer created', text='set roles for user: {}'.format(user.id), user_id=admin.user_id)
-                    message.add(message)
+                enqueue_message(subject='new officer created', text='set roles for user: {}'.format(user.id), role_name='admin')
             return result, status.HTTP_201_CREATED
         except SQLAlchemyError as e:
             db.session.rollback()
             resp = {"error": str(e)}
             return resp, status.HTTP_400_BAD_REQUEST
 
+class ProfileResource(AuthRequiredResource):
+    def get(self):
+        return get_profile(g.user.id, profile_schema)
+
 class UserDetailsResource(AuthRequiredResource):
     def get(self):
         user = User.query.get_or_404(g.user.id)
@@ -248,8 +265,7 @@ class UserDetailsResource(AuthRequiredResource):
 class DialResource(AuthRequiredResource):
     def get(self, dial_id):
         dial = Dial.query.get_or_404(dial_id)
-        result = dial_schema.dump(dial)
-        return result
+        return conditional_dump(request, dial, dial_schema)
 
     def patch(self, dial_id):
         dial = Dial.query.get_or_404(dial_id)
@@ -327,8 +343,7 @@ class DialListResource(AuthRequiredResource):
 class GradeResource(AuthRequiredResource):
     def get(self, grade_id):
         grade = Grade.query.get_or_404(grade_id)
-        result = grade_schema.dump(grade)
-        return result
+        return conditional_dump(request, grade, grade_schema)
 
     def patch(self, grade_id):
         grade = Grade.query.get_or_404(grade_id)
@@ -424,7 +439,9 @@ class AdminRoleResource(AdminAuthRequiredResource):
     def delete(self, user_id, role_id):
         role = UserRoles.query.get_or_404(role_id)
         try:
+            User.bump_role_version(user_id)
             role.delete(role)
+            invalidate_principal(user_id)
             # response = make_response()
             return '', status.HTTP_204_NO_CONTENT
         except SQLAlchemyError as e:
@@ -476,7 +493,9 @@ class AdminRoleListResource(AuthRequiredResource):
             role = UserRoles(
                 role_name=request_dict['role_name'],
                 user_id=user_id)
+            User.bump_role_version(user_id)
             role.add(role)
+            invalidate_principal(user_id)
             query = UserRoles.query.filter_by(role_name=role.role_name, user_id=user_id).first()
             result = admin_role_schema.dump(query)
             return result, status.HTTP_201_CREATED
@@ -498,14 +517,72 @@ class MessageListResource(AuthRequiredResource):
             query=query,
             resource_for_url='user_api.messagelistresource',
             key_name='results',
-            schema=message_schema)
+            schema=message_schema,
+            count_strategy='cached')
         result = pagination_helper.paginate_query()
-        for message in query:
-            if not message.read:
-                message.read = True
-                message.update()
+        # only what the client actually received counts as read
+        Message.mark_read(g.user.id, ids=[message.id for message in pagination_helper.page_objects])
         return result
 
+class MessageStreamResource(AuthRequiredResource):
+    def get(self):
+        user_id = g.user.id
+        last_id = request.headers.get('Last-Event-ID', type=int)
+        if last_id is None:
+            last_id = db.session.query(db.func.max(Message.id)).filter_by(user_id=user_id).scalar() or 0
+        db.session.rollback()
+        tail_interval = current_app.config['MESSAGE_STREAM_TAIL_INTERVAL']
+        batch_size = current_app.config['MESSAGE_STREAM_BATCH_SIZE']
+
+        def generate(last_id):
+            wake_up = message_hub.subscribe(user_id)
+            try:
+                while True:
+                    messages = Message.query.filter(Message.user_id == user_id, Message.id > last_id).order_by(
+                        Message.id).limit(batch_size).all()
+                    # serialize before the rollback expires the rows, a refresh would open a new transaction
+                    events = [(message.id, json.dumps(message_schema.dump(message))) for message in messages]
+                    # end the transaction so the next read sees rows committed elsewhere
+                    db.session.rollback()
+                    for message_id, data in events:
+                        last_id = message_id
+                        yield 'id: {}\nevent: message\ndata: {}\n\n'.format(message_id, data)
+                    if len(events) == batch_size:
+                        continue
+                    # published by Message.add and the outbox in this process, other
+                    # workers' messages are picked up by the timed re-read
+                    if not wake_up.wait(tail_interval):
+                        yield ': keep-alive\n\n'
+                    wake_up.clear()
+            finally:
+                message_hub.unsubscribe(user_id, wake_up)
+
+        headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        return Response(stream_with_context(generate(last_id)), mimetype='text/event-stream', headers=headers)
+
+class UnreadMessageCountResource(AuthRequiredResource):
+    def get(self):
+        unread = db.session.query(User.unread_messages).filter_by(id=g.user.id).scalar()
+        return {'unread': unread or 0}
+
+class MessageReadResource(AuthRequiredResource):
+    def post(self):
+        request_dict = request.get_json(force=True)
+        if not request_dict:
+            response = {'messages': 'No input data provided'}
+            return response, status.HTTP_400_BAD_REQUEST
+        errors = message_read_schema.validate(request_dict)
+        if errors:
+            return errors, status.HTTP_400_BAD_REQUEST
+        try:
+            updated = Message.mark_read(g.user.id, ids=request_dict.get('ids'),
+                                        ranges=request_dict.get('ranges'), before=request_dict.get('before'))
+            return {'updated': updated}
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            resp = {"error": str(e)}
+            return resp, status.HTTP_400_BAD_REQUEST
+
 class AdminMessageResource(AdminAuthRequiredResource):
     def patch(self, user_id, message_id):
         message = Message.query.get_or_404(message_id)
@@ -563,11 +640,73 @@ class AdminMessageListResource(AdminAuthRequiredResource):
             resp = {"error": str(e)}
             return resp, status.HTTP_400_BAD_REQUEST
 
+class UserSearchResource(AdminAuthRequiredResource):
+    def get(self):
+        errors = user_search_schema.validate(request.args)
+        if errors:
+            return errors, status.HTTP_400_BAD_REQUEST
+        query = User.search(request.args['q'].strip(), by=request.args.get('by'))
+        pagination_helper = PaginationHelper(
+            request,
+            query=query,
+            resource_for_url='user_api.usersearchresource',
+            key_name='results',
+            schema=admin_user_schema)
+        result = pagination_helper.paginate_query()
+        return result
+
+class UserImportResource(AdminAuthRequiredResource):
+    def post(self):
+        # CSV with a header row, or one JSON object per line
+        rows = list(read_rows(request.get_data(as_text=True), request.mimetype))
+        if not rows:
+            response = {'users': 'No input data provided'}
+            return response, status.HTTP_400_BAD_REQUEST
+        if len(rows) > current_app.config['USER_IMPORT_MAX_ROWS']:
+            response = {'users': 'At most {} rows per import'.format(current_app.config['USER_IMPORT_MAX_ROWS'])}
+            return response, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        valid, errors = validate_rows(rows)
+        valid = remove_existing(valid, errors)
+        imported = import_users(valid, errors, current_app.config['USER_IMPORT_CHUNK_SIZE'])
+        if imported:
+            enqueue_message(subject='users imported', text='{} users imported, accept or reject them'.format(imported),
+                            role_name='admin')
+        result = {'imported': imported, 'errors': sorted(errors, key=lambda error: error['row'])}
+        return result, status.HTTP_201_CREATED if imported else status.HTTP_400_BAD_REQUEST
+
+class BroadcastListResource(AdminAuthRequiredResource):
+    def post(self):
+        request_dict = request.get_json(force=True)
+        if not request_dict:
+            response = {'broadcast': 'No input data provided'}
+            return response, status.HTTP_400_BAD_REQUEST
+        errors = broadcast_schema.validate(request_dict)
+        if errors:
+            return errors, status.HTTP_400_BAD_REQUEST
+        try:
+            # recipients are expanded by the outbox worker with INSERT ... SELECT
+            entry = enqueue_message(subject=request_dict['subject'], text=request_dict['text'],
+                                    role_name=request_dict.get('role_name'), user_type=request_dict.get('user_type'))
+            result = {'job': entry.id, 'recipients': count_recipients(entry)}
+            return result, status.HTTP_202_ACCEPTED
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            resp = {"error": str(e)}
+            return resp, status.HTTP_400_BAD_REQUEST
+
+class BroadcastResource(AdminAuthRequiredResource):
+    def get(self, job_id):
+        entry = MessageOutbox.query.get_or_404(job_id)
+        return {'job': entry.id, 'processed': entry.processed}
+
+class AdminProfileResource(AdminAuthRequiredResource):
+    def get(self, user_id):
+        return get_profile(user_id, admin_profile_schema)
+
 class AdminUserResource(AdminAuthRequiredResource):
     def get(self, user_id):
         user = User.query.get_or_404(user_id)
-        result = admin_user_schema.dump(user)
-        return result
+        return conditional_dump(request, user, admin_user_schema)
 
     def patch(self, user_id):
         user = User.query.get_or_404(user_id)
@@ -591,9 +730,11 @@ class AdminUserResource(AdminAuthRequiredResource):
                     officer_details = OfficerDetails.query.get(user_id)
                     officer_details.delete(officer_details)
                     new_details.add(new_details)
+                User.bump_role_version(user_id)
                 roles = UserRoles.query.filter_by(user_id=user_id).all()
                 for role in roles:
                     role.delete(role)
+                invalidate_principal(user_id)
             elif new_type == 'officer':
                 if user_details:
                     new_details = OfficerDetails(user_id, user_details.firstname, user_details.lastname,
@@ -611,8 +752,14 @@ class AdminUserResource(AdminAuthRequiredResource):
     
     def delete(self, user_id):
         user = User.query.get_or_404(user_id)
+        if request.args.get('purge') == 'async':
+            # users with very many rows are removed in chunks after the response
+            invalidate_principal(user_id)
+            on_commit(start_purge, current_app._get_current_object(), User, user_id)
+            return {'user': 'Deletion started'}, status.HTTP_202_ACCEPTED
         try:
             user.delete(user)
+            invalidate_principal(user_id)
             # response = make_response()
             return '', status.HTTP_204_NO_CONTENT
         except SQLAlchemyError as e:
@@ -642,16 +789,16 @@ class FriendListResource(MentorAuthRequiredResource):
         if errors:
             return errors, status.HTTP_400_BAD_REQUEST
         friend_id = request_dict['friend_id']
+        if friend_id == user_id:
+            response = {'error': 'A user can not be their own friend'}
+            return response, status.HTTP_400_BAD_REQUEST
         User.query.get_or_404(friend_id)
         if not Friend.is_unique(user_id, friend_id):
             response = {'error': 'A friend with the same id already exists'}
             return response, status.HTTP_400_BAD_REQUEST
         try:
-            # create a new UserRole
-            friend = Friend(friend_id=friend_id, user_id=user_id)
-            friend.add(friend)
-            query = Friend.query.filter_by(user_id=user_id, friend_id=friend_id).first()
-            result = friend_schema.dump(query)
+            friend = Friend.befriend(user_id=user_id, friend_id=friend_id)
+            result = friend_schema.dump(friend)
             return result, status.HTTP_201_CREATED
         except SQLAlchemyError as e:
             db.session.rollback()
@@ -660,9 +807,9 @@ class FriendListResource(MentorAuthRequiredResource):
 
 class FriendResource(MentorAuthRequiredResource):
     def delete(self, user_id, friend_id):
-        friend = Friend.query.filter_by(user_id=user_id, friend_id=friend_id).first()
         try:
-            friend.delete(friend)
+            if not Friend.unfriend(user_id, friend_id):
+                abort(status.HTTP_404_NOT_FOUND)
             # response = make_response()
             return '', status.HTTP_204_NO_CONTENT
         except SQLAlchemyError as e:
@@ -670,28 +817,72 @@ class FriendResource(MentorAuthRequiredResource):
             resp = {"error": str(e)}
             return resp, status.HTTP_400_BAD_REQUEST
 
+class MutualFriendListResource(MentorAuthRequiredResource):
+    def get(self, user_id, other_id):
+        pagination_helper = PaginationHelper(
+            request,
+            query=Friend.mutual_query(user_id, other_id),
+            resource_for_url='user_api.mutualfriendlistresource',
+            key_name='results',
+            schema=friend_schema)
+        result = pagination_helper.paginate_query()
+        return result
+
+class FriendSuggestionResource(MentorAuthRequiredResource):
+    def get(self, user_id):
+        limit = min(request.args.get('limit', current_app.config['FRIEND_SUGGESTION_LIMIT'], type=int),
+                    current_app.config['FRIEND_SUGGESTION_LIMIT'])
+        suggestions = Friend.suggestions(user_id, limit)
+        return {'results': [{'user_id': friend_id, 'mutual': mutual} for friend_id, mutual in suggestions]}
+
+class FriendDegreeResource(MentorAuthRequiredResource):
+    def get(self, user_id):
+        friends, friends_of_friends = Friend.degrees(user_id)
+        return {'friends': friends, 'friends_of_friends': friends_of_friends}
+
 
 user_api.add_resource(UserListResource, '/users')
+add_export_resource(user_api, UserListResource, '/users')
+user_api.add_resource(UserSearchResource, '/users/search')
+add_export_resource(user_api, UserSearchResource, '/users/search')
+user_api.add_resource(UserImportResource, '/users/import')
 user_api.add_resource(UserResource, '/users/self')
 user_api.add_resource(UserDetailsResource, '/users/self/details')
+user_api.add_resource(ProfileResource, '/users/self/profile')
 
 user_api.add_resource(DialListResource, '/users/self/dials')
+add_export_resource(user_api, DialListResource, '/users/self/dials')
 user_api.add_resource(DialResource, '/users/self/dials/<int:dial_id>')
 
 user_api.add_resource(GradeListResource, '/users/self/grades')
+add_export_resource(user_api, GradeListResource, '/users/self/grades')
 user_api.add_resource(GradeResource, '/users/self/grades/<int:grade_id>')
 
 user_api.add_resource(RoleListResource, '/users/self/roles')
+add_export_resource(user_api, RoleListResource, '/users/self/roles')
 
 user_api.add_resource(MessageListResource, '/users/self/messages')
+add_export_resource(user_api, MessageListResource, '/users/self/messages')
+user_api.add_resource(MessageReadResource, '/users/self/messages/read')
+user_api.add_resource(MessageStreamResource, '/users/self/messages/stream')
+user_api.add_resource(UnreadMessageCountResource, '/users/self/messages/unread-count')
 
 user_api.add_resource(AdminUserResource, '/users/<int:user_id>')
+user_api.add_resource(AdminProfileResource, '/users/<int:user_id>/profile')
 
 user_api.add_resource(AdminRoleListResource, '/users/<int:user_id>/roles')
+add_export_resource(user_api, AdminRoleListResource, '/users/<int:user_id>/roles')
 user_api.add_resource(AdminRoleResource, '/users/<int:user_id>/roles/<int:role_id>')
 
 user_api.add_resource(AdminMessageListResource, '/users/<int:user_id>/messages')
 user_api.add_resource(AdminMessageResource, '/users/<int:user_id>/messages/<int:message_id>')
 
+user_api.add_resource(BroadcastListResource, '/messages/broadcast')
+user_api.add_resource(BroadcastResource, '/messages/broadcast/<int:job_id>')
+
 user_api.add_resource(FriendListResource, '/users/<int:user_id>/friends')
-user_api.add_resource(FriendResource, '/users/<int:user_id>/friends/<int:friend_id>')
\ No newline at end of file
+add_export_resource(user_api, FriendListResource, '/users/<int:user_id>/friends')
+user_api.add_resource(FriendResource, '/users/<int:user_id>/friends/<int:friend_id>')
+user_api.add_resource(MutualFriendListResource, '/users/<int:user_id>/friends/mutual/<int:other_id>')
+user_api.add_resource(FriendSuggestionResource, '/users/<int:user_id>/friends/suggestions')
+user_api.add_resource(FriendDegreeResource, '/users/<int:user_id>/friends/degree')
\ No newline at end of file
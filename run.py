@@ -9,8 +9,8 @@ from apispec.ext.marshmallow import MarshmallowPlugin
 from apispec_webframeworks.flask import FlaskPlugin
 
 from app import create_app
-from auth import basic_auth, roles_required, token_auth
-from flask import g, jsonify
+from auth import basic_auth, invalidate_principal, roles_required, token_auth
+from flask import g, jsonify, request
 from flask_swagger import swagger
 from models.UserModel import User
 from resources.users import user_schema, db
@@ -37,9 +37,14 @@ spec = APISpec(
 @basic_auth.login_required
 def get_auth_token():
     """
-    return Authentication token as json
+    return Authentication token as json.
+    pass ?claims=true for a short lived token that carries the user's roles
     """
-    token = g.user.generate_auth_token()
+    claims = request.args.get('claims', app.config['AUTH_TOKEN_CLAIMS'], type=lambda v: v.lower() in ('1', 'true'))
+    if claims:
+        token = g.user.generate_auth_token(app.config['AUTH_CLAIMS_TOKEN_EXPIRATION'], claims=True)
+    else:
+        token = g.user.generate_auth_token(app.config['AUTH_TOKEN_EXPIRATION'])
     return jsonify({'token': token.decode('ascii')})
 
 @app.route('/api/users/<int:user_id>/accept', methods=['POST'])
@@ -49,7 +54,9 @@ def accept_user(user_id):
     user = User.query.get_or_404(user_id)
     try:
         user.authorized = 1
+        User.bump_role_version(user_id)
         user.update()
+        invalidate_principal(user_id)
         return user_schema.dump(user)
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -0,0 +1,282 @@
+import datetime
+import random
+
+import hashing
+from helpers import execute_insert
+from normalization import normalize_row
+from models.AccountingModel import Expense
+from models.CampModel import Camp, UserPayments
+from models.DocumentModel import Book, Booklet, Category, Document, Voice
+from models.EduModel import Course, Exam, ExamResult, Lecture, LectureSession, LectureUser, LectureUserSession
+from models.HeyatModel import Heyat, HeyatUsers
+from models.ReportModel import CampReport, HeyatReport, LectureReport, Multimedia, Report
+from models.SessionModel import Deadline, Session, SessionDetails, SessionUser, Task
+from models.SportModel import Sport, SportUsers
+from models.UserModel import (Dial, Friend, Grade, Message, OfficerDetails, RolesEnum, StudentDetails,
+                              User, UserDetails, UserRoles, db)
+
+# every seeded user logs in with this password
+SEED_PASSWORD = 'password'
+
+FIRSTNAMES = ['علی', 'محمد', 'حسین', 'مهدی', 'رضا', 'کاظم', 'یاسر', 'مرتضی', 'حمید', 'سجاد']
+LASTNAMES = ['احمدی', 'محمدی', 'حسینی', 'رضایی', 'کریمی', 'موسوی', 'جعفری', 'صادقی', 'هاشمی', 'نوری']
+ROLE_NAMES = [role.name.lower() for role in RolesEnum if role is not RolesEnum.ADMIN]
+EPOCH = datetime.datetime(2020, 1, 1)
+
+
+class Seeder():
+    """write synthetic rows with core executemany inserts, batch_size rows per transaction
+
+    ids are assigned here from the table's current maximum so children can reference
+    their parents without reading them back"""
+
+    def __init__(self, batch_size, random_seed=0):
+        self.batch_size = batch_size
+        self.random = random.Random(random_seed)
+        self.counts = {}
+
+    def next_id(self, model):
+        primary_key = db.inspect(model).primary_key[0]
+        return (db.session.query(db.func.max(primary_key)).scalar() or 0) + 1
+
+    def insert(self, model, rows):
+        table = model.__table__
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == self.batch_size:
+                self.write(table, batch)
+                batch = []
+        if batch:
+            self.write(table, batch)
+
+    def write(self, table, batch):
+        execute_insert(db.session, table.insert(), batch)
+        db.session.commit()
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(batch)
+
+    def sample(self, pool, count):
+        return self.random.sample(pool, min(count, len(pool)))
+
+    def moment(self, days=365 * 3):
+        return EPOCH + datetime.timedelta(days=self.random.randrange(days), minutes=self.random.randrange(24 * 60))
+
+    def seed_users(self, count, fanout):
+        """users with details, a dial and messages, roles and a grade for officers, symmetric friendships"""
+        first_id = self.next_id(User)
+        ids = list(range(first_id, first_id + count))
+        # one in five is an officer, the first one always so lectures have a teacher
+        officers = ids[::5]
+        students = [user_id for user_id in ids if (user_id - first_id) % 5]
+        password = hashing.hash_password(SEED_PASSWORD)
+        unread = [self.random.randint(0, fanout['messages']) for _ in ids]
+        self.insert(User, ({
+            'id': user_id, 'username': 'seed{}'.format(user_id), 'email': 'seed{}@example.com'.format(user_id),
+            'email_normalized': 'seed{}@example.com'.format(user_id), 'password': password,
+            'type': 'officer' if (user_id - first_id) % 5 == 0 else 'student', 'authorized': True,
+            'unread_messages': unread[index]} for index, user_id in enumerate(ids)))
+        self.insert(UserDetails, (normalize_row(UserDetails, {
+            'user_id': user_id, 'firstname': self.random.choice(FIRSTNAMES),
+            'lastname': self.random.choice(LASTNAMES), 'fathername': self.random.choice(FIRSTNAMES),
+            'nat_id': '{:010d}'.format(self.random.randrange(10 ** 10)),
+            'birth_date': EPOCH - datetime.timedelta(days=self.random.randrange(6000, 15000))}) for user_id in ids))
+        self.insert(StudentDetails, ({
+            'id': user_id, 'school': 'school {}'.format(self.random.randrange(50)),
+            'major': self.random.choice(['math', 'physics', 'humanities']),
+            'last_average': round(self.random.uniform(10, 20), 2), 'grade': self.random.randint(7, 12),
+            'group': str(self.random.randrange(20))} for user_id in students))
+        self.insert(OfficerDetails, ({
+            'id': user_id, 'coop_start_date': self.moment(), 'work_experience': self.random.randint(0, 20)}
+            for user_id in officers))
+        self.insert(UserRoles, ({'user_id': user_id, 'role_name': role_name}
+                                for user_id in officers for role_name in self.sample(ROLE_NAMES, 2)))
+        self.insert(Grade, ({
+            'user_id': user_id, 'major': 'major', 'college': 'college {}'.format(self.random.randrange(30)),
+            'degree': self.random.choice(['diploma', 'bachelor', 'master', 'doctorate'])} for user_id in officers))
+        self.insert(Dial, ({'user_id': user_id, 'number': '0912{:07d}'.format(user_id % 10 ** 7), 'type': 'mobile'}
+                           for user_id in ids))
+        # the newest messages of each user are the unread ones, matching unread_messages
+        self.insert(Message, ({
+            'user_id': user_id, 'subject': 'message {}'.format(number), 'text': 'seeded message text',
+            'read': number < fanout['messages'] - unread[index]}
+            for index, user_id in enumerate(ids) for number in range(fanout['messages'])))
+        pairs = set()
+        for user_id in ids:
+            for friend_id in self.sample(ids, fanout['friends'] + 1):
+                if friend_id != user_id:
+                    pairs.update([(user_id, friend_id), (friend_id, user_id)])
+        self.insert(Friend, ({'user_id': user_id, 'friend_id': friend_id} for user_id, friend_id in sorted(pairs)))
+        return ids, students, officers
+
+    def seed_sessions(self, count, fanout, users):
+        """sessions with details, members, their tasks and a deadline per task"""
+        first_id = self.next_id(Session)
+        ids = list(range(first_id, first_id + count))
+        moments = {session_id: self.moment() for session_id in ids}
+        self.insert(Session, ({'id': session_id, 'subject': 'session {}'.format(session_id),
+                               'datetime': moments[session_id], 'done': moments[session_id] < EPOCH.replace(year=2022)}
+                              for session_id in ids))
+        self.insert(SessionDetails, ({'session_id': session_id, 'number': number, 'kind': 'weekly',
+                                      'location': 'room {}'.format(self.random.randrange(20))}
+                                     for number, session_id in enumerate(ids, start=1)))
+        members = [(user_id, session_id) for session_id in ids for user_id in self.sample(users, fanout['session_members'])]
+        self.insert(SessionUser, ({'user_id': user_id, 'session_id': session_id, 'present': self.random.random() < 0.8}
+                                  for user_id, session_id in members))
+        task_id = self.next_id(Task)
+        tasks = []
+        for user_id, session_id in members:
+            for _ in range(fanout['tasks']):
+                tasks.append((task_id, user_id, session_id))
+                task_id += 1
+        self.insert(Task, ({'id': task_id, 'user_id': user_id, 'session_id': session_id,
+                            'subject': 'task {}'.format(task_id), 'done': self.random.random() < 0.5,
+                            'priority': self.random.choice(['high', 'normal', 'low'])}
+                           for task_id, user_id, session_id in tasks))
+        self.insert(Deadline, ({'task_id': task_id, 'expiration_datetime': self.moment()} for task_id, _, _ in tasks))
+        return ids
+
+    def seed_courses(self, count, fanout, students, officers):
+        """courses with lectures, their students, sessions with attendance, and exams with results"""
+        first_id = self.next_id(Course)
+        ids = list(range(first_id, first_id + count))
+        self.insert(Course, (normalize_row(Course, {
+            'id': course_id, 'name': 'درس {}'.format(course_id), 'fac': self.random.randrange(10),
+            'grade': self.random.randint(7, 12), 'major': self.random.choice(['math', 'physics', 'humanities'])})
+            for course_id in ids))
+        lecture_id = self.next_id(Lecture)
+        lectures = []
+        for course_id in ids:
+            for number in range(fanout['lectures']):
+                lectures.append((lecture_id, course_id, number))
+                lecture_id += 1
+        self.insert(Lecture, ({'id': lecture_id, 'course_id': course_id, 'name': 'lecture {}'.format(lecture_id),
+                               'group': 'group {}'.format(number), 'teacher_id': self.random.choice(officers)}
+                              for lecture_id, course_id, number in lectures))
+        enrolled = {lecture_id: self.sample(students, fanout['lecture_students']) for lecture_id, _, _ in lectures}
+        self.insert(LectureUser, ({'student_id': student_id, 'lecture_id': lecture_id}
+                                  for lecture_id, student_ids in enrolled.items() for student_id in student_ids))
+        session_id = self.next_id(LectureSession)
+        sessions = []
+        for lecture_id, _, _ in lectures:
+            for number in range(1, fanout['lecture_sessions'] + 1):
+                sessions.append((session_id, lecture_id, number))
+                session_id += 1
+        self.insert(LectureSession, ({
+            'id': session_id, 'lecture_id': lecture_id, 'number': number, 'subject': 'session {}'.format(number),
+            'datetime': self.moment(), 'end_time': datetime.time(self.random.randint(9, 18)),
+            'location': 'class {}'.format(self.random.randrange(30))} for session_id, lecture_id, number in sessions))
+        self.insert(LectureUserSession, ({
+            'student_id': student_id, 'session_id': session_id, 'present': self.random.random() < 0.9,
+            'homework_mark': self.random.randint(0, 20)}
+            for session_id, lecture_id, _ in sessions for student_id in enrolled[lecture_id]))
+        exam_id = self.next_id(Exam)
+        exams = []
+        for lecture_id, _, _ in lectures:
+            for _ in range(fanout['exams']):
+                exams.append((exam_id, lecture_id))
+                exam_id += 1
+        self.insert(Exam, ({'id': exam_id, 'lecture_id': lecture_id, 'datetime': self.moment(),
+                            'type': self.random.choice(['quiz', 'midterm', 'final'])} for exam_id, lecture_id in exams))
+        self.insert(ExamResult, ({'exam_id': exam_id, 'student_id': student_id, 'score': self.random.randint(0, 20)}
+                                 for exam_id, lecture_id in exams for student_id in enrolled[lecture_id]))
+        return [lecture_id for lecture_id, _, _ in lectures]
+
+    def seed_heyats(self, count, fanout, users):
+        first_id = self.next_id(Heyat)
+        ids = list(range(first_id, first_id + count))
+        self.insert(Heyat, (normalize_row(Heyat, {
+            'id': heyat_id, 'type': self.random.choice(['celebration', 'mourning']),
+            'reason': 'مراسم {}'.format(heyat_id), 'datetime': self.moment(), 'speaker': self.random.choice(LASTNAMES),
+            'singer': self.random.choice(LASTNAMES), 'meal': 'dinner'}) for heyat_id in ids))
+        self.insert(HeyatUsers, ({'heyat_id': heyat_id, 'user_id': user_id, 'present': self.random.random() < 0.8,
+                                  'rate': self.random.randint(1, 5)}
+                                 for heyat_id in ids for user_id in self.sample(users, fanout['heyat_members'])))
+        return ids
+
+    def seed_sports(self, count, fanout, users):
+        first_id = self.next_id(Sport)
+        ids = list(range(first_id, first_id + count))
+        self.insert(Sport, ({'id': sport_id, 'type': self.random.choice(['football', 'judo']),
+                             'venue': 'venue {}'.format(self.random.randrange(10)), 'datetime': self.moment()}
+                            for sport_id in ids))
+        self.insert(SportUsers, ({'sport_id': sport_id, 'user_id': user_id, 'present': self.random.random() < 0.8,
+                                  'rate': self.random.randint(1, 5)}
+                                 for sport_id in ids for user_id in self.sample(users, fanout['sport_members'])))
+        return ids
+
+    def seed_camps(self, count, fanout, users):
+        first_id = self.next_id(Camp)
+        ids = list(range(first_id, first_id + count))
+        moments = {camp_id: self.moment() for camp_id in ids}
+        self.insert(Camp, ({'id': camp_id, 'subject': 'camp {}'.format(camp_id),
+                            'location': 'location {}'.format(self.random.randrange(20)), 'go_time': moments[camp_id],
+                            'back_time': moments[camp_id] + datetime.timedelta(days=3), 'cost_per_person': '500000'}
+                           for camp_id in ids))
+        self.insert(UserPayments, ({'camp_id': camp_id, 'user_id': user_id, 'paid_value': '500000',
+                                    'rate': self.random.randint(1, 5)}
+                                   for camp_id in ids for user_id in self.sample(users, fanout['camp_members'])))
+        return ids
+
+    def seed_documents(self, count, fanout):
+        """documents spread over the categories, split between books, voices and booklets"""
+        category_id = self.next_id(Category)
+        categories = list(range(category_id, category_id + fanout['categories']))
+        self.insert(Category, ({'id': category_id, 'name': 'category {}'.format(category_id)}
+                               for category_id in categories))
+        first_id = self.next_id(Document)
+        ids = list(range(first_id, first_id + count))
+        types = {document_id: ('book', 'voice', 'booklet')[document_id % 3] for document_id in ids}
+        self.insert(Document, (normalize_row(Document, {
+            'id': document_id, 'topic': 'سند {}'.format(document_id), 'subject': 'subject',
+            'file_path': 'documents/{}.pdf'.format(document_id), 'level': self.random.randint(1, 5),
+            'type': types[document_id], 'category_id': self.random.choice(categories)}) for document_id in ids))
+        self.insert(Book, ({'id': document_id, 'author': self.random.choice(LASTNAMES), 'publish_date': self.moment().date()}
+                           for document_id in ids if types[document_id] == 'book'))
+        self.insert(Voice, ({'id': document_id, 'speaker': self.random.choice(LASTNAMES),
+                             'production_date': self.moment().date()}
+                            for document_id in ids if types[document_id] == 'voice'))
+        self.insert(Booklet, ({'id': document_id, 'author': self.random.choice(LASTNAMES),
+                               'production_date': self.moment().date()}
+                              for document_id in ids if types[document_id] == 'booklet'))
+        return ids
+
+    def seed_reports(self, count, fanout, officers, heyats, camps, lectures):
+        """reports on heyats, camps and lectures, by officers, with their multimedia"""
+        subjects = [(kind, model, column, pool) for kind, model, column, pool in [
+            ('heyat', HeyatReport, 'heyat_id', heyats), ('camp', CampReport, 'camp_id', camps),
+            ('lecture', LectureReport, 'lecture_id', lectures)] if pool]
+        if not subjects:
+            return []
+        first_id = self.next_id(Report)
+        ids = list(range(first_id, first_id + count))
+        kinds = {report_id: subjects[report_id % len(subjects)] for report_id in ids}
+        self.insert(Report, ({'id': report_id, 'reporter_id': self.random.choice(officers),
+                              'description': 'seeded report', 'type': kinds[report_id][0]} for report_id in ids))
+        for kind, model, column, pool in subjects:
+            self.insert(model, ({'id': report_id, column: self.random.choice(pool)}
+                                for report_id in ids if kinds[report_id][0] == kind))
+        self.insert(Multimedia, ({'report_id': report_id, 'path': 'reports/{}-{}.jpg'.format(report_id, number),
+                                  'format': self.random.choice(['mp3', 'mp4', 'pdf'])}
+                                 for report_id in ids for number in range(fanout['multimedia'])))
+        return ids
+
+    def seed_expenses(self, count, officers):
+        self.insert(Expense, ({'topic': 'expense', 'invoice': 'INV-{}'.format(number),
+                               'cost': self.random.randrange(10, 10000) * 1000, 'date': self.moment().date(),
+                               'user_id': self.random.choice(officers), 'owner': self.random.choice(LASTNAMES), 'state': self.random.random() < 0.7}
+                              for number in range(count)))
+
+
+def seed(volumes, fanout, batch_size, random_seed=0):
+    """generate volumes parents per table with fanout children each, return rows written per table"""
+    seeder = Seeder(batch_size, random_seed)
+    users, students, officers = seeder.seed_users(max(volumes['users'], 1), fanout)
+    seeder.seed_sessions(volumes['sessions'], fanout, users)
+    lectures = seeder.seed_courses(volumes['courses'], fanout, students, officers)
+    heyats = seeder.seed_heyats(volumes['heyats'], fanout, users)
+    seeder.seed_sports(volumes['sports'], fanout, users)
+    camps = seeder.seed_camps(volumes['camps'], fanout, users)
+    seeder.seed_documents(volumes['documents'], fanout)
+    seeder.seed_reports(volumes['reports'], fanout, officers, heyats, camps, lectures)
+    seeder.seed_expenses(volumes['expenses'], officers)
+    return seeder.counts
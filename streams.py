@@ -0,0 +1,42 @@
+from threading import Event, Lock
+
+
+class MessageHub():
+    """In-process pub/sub waking the message streams of a user.
+
+    Subscribers only get woken up, they read the rows themselves by id, so a
+    missed or coalesced wake-up never loses a message.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = Lock()
+
+    def subscribe(self, user_id):
+        event = Event()
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(event)
+        return event
+
+    def unsubscribe(self, user_id, event):
+        with self._lock:
+            events = self._subscribers.get(user_id)
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id):
+        with self._lock:
+            events = list(self._subscribers.get(user_id, ()))
+        for event in events:
+            event.set()
+
+    def publish_all(self):
+        with self._lock:
+            events = [event for events in self._subscribers.values() for event in events]
+        for event in events:
+            event.set()
+
+
+message_hub = MessageHub()
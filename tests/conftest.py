@@ -0,0 +1,43 @@
+import base64
+
+import pytest
+
+import config
+
+# small enough to seed in a second, big enough that every list has rows behind id 1
+SEED_VOLUMES = {
+    'users': 50, 'sessions': 5, 'courses': 2, 'heyats': 3, 'sports': 3,
+    'camps': 2, 'documents': 10, 'reports': 5, 'expenses': 5,
+}
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    # run builds the app from the config module on import
+    config.SQLALCHEMY_DATABASE_URI = 'sqlite:///{}'.format(tmp_path_factory.mktemp('db') / 'test.sqlite')
+    config.OUTBOX_WORKER = False
+    from run import app
+    from models.UserModel import RolesEnum, UserRoles, db
+    import seed
+    with app.app_context():
+        db.create_all()
+        seed.seed(SEED_VOLUMES, config.SEED_FANOUT, config.SEED_BATCH_SIZE)
+        # the first seeded user is an officer, give it every role so each resource answers
+        granted = {role.role_name for role in UserRoles.query.filter_by(user_id=1)}
+        db.session.add_all([UserRoles(user_id=1, role_name=role.name.lower())
+                            for role in RolesEnum if role.name.lower() not in granted])
+        db.session.commit()
+    return app
+
+
+@pytest.fixture(scope='session')
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='session')
+def auth_headers(client):
+    from seed import SEED_PASSWORD
+    credentials = base64.b64encode('seed1:{}'.format(SEED_PASSWORD).encode()).decode()
+    response = client.get('/api/gettoken', headers={'Authorization': 'Basic ' + credentials})
+    return {'Authorization': 'Token ' + response.get_json()['token']}
@@ -0,0 +1,62 @@
+import query_plans
+from models.UserModel import db
+
+
+def test_routes_are_collected(app):
+    urls = query_plans.route_urls(app)
+    assert '/api/users/self/messages' in urls
+    assert '/api/courses/1/lectures/1/exams/1/users' in urls
+    assert not [url for url in urls if url.endswith('/stream')]
+    assert '/api/users/search?q=seed&by=username' in urls
+    assert '/api/users/search?q=seed' not in urls
+    assert '/api/users/search?q=seed' in query_plans.route_urls(app, dialect_name='mysql')
+
+
+def test_search_joins_the_matching_ids(app, client, auth_headers):
+    with app.app_context():
+        statements = query_plans.capture_statements(client, '/api/users/search?q=seed', auth_headers)
+    searches = [statement for statement, parameters in statements if 'UNION' in statement]
+    assert searches
+    assert not [statement for statement in searches if ' IN (' in statement]
+    response = client.get('/api/users/search?q=seed&by=username', headers=auth_headers)
+    assert all(user['username'].startswith('seed') for user in response.get_json()['results'])
+
+
+def test_full_scans_sqlite():
+    rows = [
+        {'detail': 'SCAN message'},
+        {'detail': 'SCAN TABLE document'},
+        {'detail': 'SCAN user_1 USING COVERING INDEX ix_user_type'},
+        {'detail': 'SEARCH message USING INDEX ix_message_user_id_read (user_id=?)'},
+        {'detail': 'SCAN anon_1'},
+        {'detail': 'SCAN CONSTANT ROW'},
+    ]
+    assert query_plans.full_scans(rows, 'sqlite') == rows[:3]
+
+
+def test_full_scans_mysql():
+    rows = [
+        {'table': 'message', 'type': 'ALL'},
+        {'table': 'user', 'type': 'index'},
+        {'table': 'message', 'type': 'ref'},
+        {'table': '<derived2>', 'type': 'ALL'},
+        {'table': None, 'type': None},
+    ]
+    assert query_plans.full_scans(rows, 'mysql') == rows[:2]
+
+
+def test_an_unindexed_filter_is_reported(app, client, auth_headers):
+    with app.app_context():
+        db.session.execute('DROP INDEX ix_document_category_id')
+        db.session.commit()
+    try:
+        failures = query_plans.check_query_plans(app, client, auth_headers)
+    finally:
+        with app.app_context():
+            db.Index('ix_document_category_id', db.metadata.tables['document'].c.category_id).create(db.get_engine())
+    assert '/api/category/1/documents' in {url for url, statement, rows in failures}
+
+
+def test_filtered_queries_use_indexes(app, client, auth_headers):
+    failures = query_plans.check_query_plans(app, client, auth_headers)
+    assert failures == []
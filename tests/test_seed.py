@@ -0,0 +1,11 @@
+from models.UserModel import User
+
+
+def test_seeded_profiles_load(app, client, auth_headers):
+    with app.app_context():
+        students = [user.id for user in User.query.filter_by(type='student').limit(5)]
+        officers = [user.id for user in User.query.filter_by(type='officer').limit(5)]
+    assert students and officers
+    for user_id in students + officers:
+        response = client.get('/api/users/{}/profile'.format(user_id), headers=auth_headers)
+        assert response.status_code == 200, (user_id, response.get_json())
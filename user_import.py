@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+
+from marshmallow.exceptions import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+
+import hashing
+from hashing import import_hash_pool
+from helpers import execute_insert
+from normalization import normalize_row
+from models.UserModel import (OfficerDetails, OfficerSchema, StudentDetails, StudentSchema,
+                              User, UserDetails, UserSchema, db)
+
+user_schema = UserSchema()
+details_schemas = {'student': StudentSchema(), 'officer': OfficerSchema()}
+details_tables = {'student': StudentDetails.__table__, 'officer': OfficerDetails.__table__}
+
+USER_FIELDS = {name for name, field in user_schema.fields.items() if not field.dump_only}
+
+
+def read_rows(data, content_type):
+    """yield (row number, row, error) from a CSV or JSON lines body"""
+    if content_type == 'text/csv':
+        for number, row in enumerate(csv.DictReader(io.StringIO(data)), start=1):
+            # empty cells count as missing so optional fields stay optional
+            yield number, {key: value for key, value in row.items() if key and value not in (None, '')}, None
+        return
+    for number, line in enumerate(data.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, {'row': str(e)}
+            continue
+        if not isinstance(row, dict):
+            yield number, None, {'row': 'expected a JSON object'}
+            continue
+        yield number, row, None
+
+
+def validate_rows(rows):
+    """validate every row in one pass, return ([(number, user, details)], errors)"""
+    valid = []
+    errors = []
+    usernames = set()
+    emails = set()
+    for number, row, error in rows:
+        if error:
+            errors.append({'row': number, 'errors': error})
+            continue
+        try:
+            user = user_schema.load({key: value for key, value in row.items() if key in USER_FIELDS})
+        except ValidationError as e:
+            errors.append({'row': number, 'errors': e.messages})
+            continue
+        details = None
+        details_fields = {key: value for key, value in row.items() if key not in USER_FIELDS}
+        if details_fields:
+            try:
+                details = details_schemas[user['type']].load(details_fields)
+            except ValidationError as e:
+                errors.append({'row': number, 'errors': e.messages})
+                continue
+        user['email_normalized'] = User.normalize_email(user['email'])
+        if user['username'] in usernames or user['email_normalized'] in emails:
+            errors.append({'row': number, 'errors': {'user': 'Duplicate username or email in this import'}})
+            continue
+        usernames.add(user['username'])
+        emails.add(user['email_normalized'])
+        valid.append((number, user, details))
+    return valid, errors
+
+
+def remove_existing(valid, errors):
+    """drop rows whose username or email is taken, checked with a single query"""
+    if not valid:
+        return valid
+    usernames = [user['username'] for _, user, _ in valid]
+    emails = [user['email_normalized'] for _, user, _ in valid]
+    taken = db.session.query(User.username, User.email_normalized).filter(
+        db.or_(User.username.in_(usernames), User.email_normalized.in_(emails))).all()
+    taken_usernames = {username for username, _ in taken}
+    taken_emails = {email for _, email in taken}
+    remaining = []
+    for number, user, details in valid:
+        if user['username'] in taken_usernames or user['email_normalized'] in taken_emails:
+            errors.append({'row': number, 'errors': {'user': 'An user with the same username or email already exists'}})
+        else:
+            remaining.append((number, user, details))
+    return remaining
+
+
+def insert_chunk(chunk):
+    passwords = import_hash_pool.map(hashing.hash_password, [user['password'] for _, user, _ in chunk], block=True)
+    user_rows = [{'username': user['username'], 'email': user['email'],
+                  'email_normalized': user['email_normalized'], 'password': password, 'type': user['type']}
+                 for (_, user, _), password in zip(chunk, passwords)]
+    execute_insert(db.session, User.__table__.insert(), user_rows)
+    ids = dict(db.session.query(User.username, User.id).filter(
+        User.username.in_([row['username'] for row in user_rows])))
+    details_rows = []
+    type_rows = {'student': [], 'officer': []}
+    base_columns = UserDetails.__table__.c.keys()
+    for _, user, details in chunk:
+        if details is None:
+            continue
+        user_id = ids[user['username']]
+        details_row = dict({key: details.get(key) for key in base_columns if key != 'user_id'}, user_id=user_id)
+        details_rows.append(normalize_row(UserDetails, details_row))
+        type_columns = details_tables[user['type']].c.keys()
+        type_rows[user['type']].append(dict({key: details.get(key) for key in type_columns if key != 'id'}, id=user_id))
+    if details_rows:
+        execute_insert(db.session, UserDetails.__table__.insert(), details_rows)
+    for type, rows in type_rows.items():
+        if rows:
+            execute_insert(db.session, details_tables[type].insert(), rows)
+
+
+def import_users(valid, errors, chunk_size):
+    """insert validated rows in chunked transactions, return how many were imported"""
+    imported = 0
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        try:
+            insert_chunk(chunk)
+            db.session.commit()
+            imported += len(chunk)
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            errors.extend({'row': number, 'errors': {'error': str(e)}} for number, _, _ in chunk)
+    return imported